@@ -0,0 +1,88 @@
+import argparse
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+import typing
+from dataclasses import dataclass
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+)
+
+from db.storage.users import User  # noqa: E402
+
+
+@dataclass
+class LegacyUser:
+    ADMIN = "admin"
+    USER = "user"
+    BLOCKED = "blocked"
+
+    locations = {"1": "Москва", "2": "Долгопрудный"}
+
+    id: int
+    name: typing.Optional[str] = None
+    phone: typing.Optional[str] = None
+    emergency_contact: typing.Optional[str] = None
+    role: str = USER
+    location: str = "1"
+
+
+def make_rows(count: int) -> typing.List[tuple]:
+    return [
+        (
+            100000000 + index,
+            f"Бегун {index}",
+            f"+7999{index:07d}",
+            f"+7900{index:07d}",
+            User.USER,
+            "1",
+        )
+        for index in range(count)
+    ]
+
+
+def build_legacy(rows: typing.List[tuple]) -> list:
+    return [
+        LegacyUser(data[0], data[1], data[2], data[3], data[4], data[5])
+        for data in rows
+    ]
+
+
+def build_slotted(rows: typing.List[tuple]) -> list:
+    return [User.from_record(data) for data in rows]
+
+
+def allocated(build: typing.Callable, rows: typing.List[tuple]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    users = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare building users from rows with the old and slotted models"
+    )
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = make_rows(args.users)
+    print(f"{args.users} users, best of {args.repeat}:")
+    for name, build in (("dataclass", build_legacy), ("slotted", build_slotted)):
+        seconds = min(timeit.repeat(lambda: build(rows), number=1, repeat=args.repeat))
+        size = allocated(build, rows)
+        print(
+            f"  {name:10} {seconds * 1e3:8.2f} ms  "
+            f"{size / 1024:9.1f} KiB  {size / args.users:6.1f} B/user"
+        )
+
+
+if __name__ == "__main__":
+    main()
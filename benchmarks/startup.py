@@ -0,0 +1,93 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+
+SRC_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+)
+STARTUP_BUDGET = 3.5
+PLACEHOLDER_ENV = {
+    "TGBOT_API_KEY": "0:startup-benchmark",
+    "HOST": "localhost",
+    "PORT": "5432",
+    "LOGIN": "postgres",
+    "PASSWORD": "postgres",
+    "DATABASE": "postgres",
+}
+
+
+def parse_importtime(stderr: str) -> typing.List[typing.Tuple[int, int, str]]:
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return modules
+
+
+def run_once(module: str, cold: bool) -> typing.Tuple[float, list]:
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    with tempfile.TemporaryDirectory() as pycache:
+        if cold:
+            env["PYTHONPYCACHEPREFIX"] = pycache
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SRC_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+    return elapsed, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how long the bot takes to import before it can serve"
+    )
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--cold", action="store_true", help="ignore cached bytecode")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=STARTUP_BUDGET,
+        help="fail above this many seconds",
+    )
+    args = parser.parse_args()
+
+    timings = []
+    modules = []
+    for _ in range(args.runs):
+        elapsed, modules = run_once(args.module, args.cold)
+        timings.append(elapsed)
+
+    imports = sum(cumulative for _, cumulative, name in modules if name[1] != " ")
+    median = statistics.median(timings)
+    print(f"interpreter start + import {args.module}: median {median:.3f}s")
+    print(f"runs: {', '.join(f'{timing:.3f}' for timing in timings)}")
+    print(f"import time (last run): {imports / 1e6:.3f}s")
+    print("slowest modules by self time:")
+    for self_us, cumulative_us, name in sorted(modules, reverse=True)[: args.top]:
+        print(
+            f"  {self_us / 1e3:9.1f} ms  {cumulative_us / 1e3:9.1f} ms  {name.strip()}"
+        )
+
+    if median > args.budget:
+        print(f"over budget: {median:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
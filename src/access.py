@@ -0,0 +1,56 @@
+import asyncio
+from typing import Iterable, Optional, Set
+
+import aiogram
+from aiogram.filters import BaseFilter
+
+from db.storage import User, UsersStorage
+
+
+class AccessControl:
+    def __init__(self, users_storage: UsersStorage, bootstrap_admins: Iterable[int]):
+        self._users_storage = users_storage
+        self._bootstrap_admins = frozenset(bootstrap_admins)
+        self._admins: Set[int] = set()
+        self._blocked: Set[int] = set()
+        self._reload_task: Optional[asyncio.Task] = None
+
+    async def init(self):
+        await self._users_storage.listen_roles(self._on_role_change)
+        await self.reload()
+
+    async def reload(self):
+        self._admins = set(await self._users_storage.get_role_list(User.ADMIN))
+        self._blocked = set(await self._users_storage.get_role_list(User.BLOCKED))
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self._admins
+
+    def is_blocked(self, user_id: int) -> bool:
+        return user_id in self._blocked
+
+    def role_for_new_user(self, user_id: int) -> str:
+        return User.ADMIN if user_id in self._bootstrap_admins else User.USER
+
+    def _on_role_change(self, payload: str):
+        if payload == "reload":
+            if self._reload_task is None or self._reload_task.done():
+                self._reload_task = asyncio.create_task(self.reload())
+            return
+        user_id, _, role = payload.partition(":")
+        self._admins.discard(int(user_id))
+        self._blocked.discard(int(user_id))
+        if role == User.ADMIN:
+            self._admins.add(int(user_id))
+        elif role == User.BLOCKED:
+            self._blocked.add(int(user_id))
+
+
+class AdminFilter(BaseFilter):
+    def __init__(self, access: AccessControl):
+        self._access = access
+
+    async def __call__(
+        self, event: aiogram.types.Message | aiogram.types.CallbackQuery
+    ) -> bool:
+        return event.from_user is not None and self._access.is_admin(event.from_user.id)
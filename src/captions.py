@@ -0,0 +1,62 @@
+import html
+from collections import OrderedDict
+from typing import Tuple
+
+from db.storage import Event
+
+CAPTION_LIMIT = 1024
+
+
+class EventCaptions:
+    russian_days = (
+        "Понедельник",
+        "Вторник",
+        "Среда",
+        "Четверг",
+        "Пятница",
+        "Суббота",
+        "Воскресенье",
+    )
+
+    def __init__(self, max_size: int = 1024):
+        self._cache: OrderedDict[Tuple, str] = OrderedDict()
+        self._max_size = max_size
+
+    def render(self, event: Event, prefix: str = "", suffix: str = "") -> str:
+        key = (event.id, event.updated_at, prefix, suffix)
+        caption = self._cache.get(key)
+        if caption is not None:
+            self._cache.move_to_end(key)
+            return caption
+
+        caption = self._build(event, prefix, suffix)
+        self._cache[key] = caption
+        if len(self._cache) > self._max_size:
+            self._cache.popitem(last=False)
+        return caption
+
+    def _build(self, event: Event, prefix: str, suffix: str) -> str:
+        date = event.date
+        details = (
+            f"\n\n{self.russian_days[date.weekday()]} "
+            f"{date.day:02}.{date.month:02} в {date.hour:02}:{date.minute:02}"
+            f"\n\n📍{html.escape(event.location or '')}\n{html.escape(event.tempo or '')}"
+            "\n\nДо старта 🏃‍➡️"
+        )
+        if suffix:
+            details += f"\n\n{suffix}"
+
+        description = event.description or ""
+        budget = CAPTION_LIMIT - _utf16_length(prefix) - _utf16_length(details)
+        if _utf16_length(description) > budget:
+            description = (
+                description.encode("utf-16-le")[: max(budget - 1, 0) * 2]
+                .decode("utf-16-le", errors="ignore")
+                .rstrip()
+                + "…"
+            )
+        return f"{prefix}{html.escape(description)}{details}"
+
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+import time
+import typing
+
+
+logger = logging.getLogger(__name__)
+
+
+class Coalescer:
+    def __init__(
+        self,
+        interval: float,
+        callback: typing.Callable[[typing.Hashable], typing.Awaitable],
+    ):
+        self._interval = interval
+        self._callback = callback
+        self._dirty: typing.Set[typing.Hashable] = set()
+        self._tasks: typing.Dict[typing.Hashable, asyncio.Task] = {}
+        self._last_run: typing.Dict[typing.Hashable, float] = {}
+
+    @property
+    def tasks(self) -> typing.List[asyncio.Task]:
+        return list(self._tasks.values())
+
+    def touch(self, key: typing.Hashable):
+        self._dirty.add(key)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    def forget(self, key: typing.Hashable):
+        self._dirty.discard(key)
+        self._last_run.pop(key, None)
+
+    async def _run(self, key: typing.Hashable):
+        try:
+            while key in self._dirty:
+                delay = self._last_run.get(key, 0) + self._interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._dirty.discard(key)
+                self._last_run[key] = time.monotonic()
+                try:
+                    await self._callback(key)
+                except Exception:
+                    logger.exception("Coalesced callback failed for %r", key)
+        finally:
+            del self._tasks[key]
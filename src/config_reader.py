@@ -1,3 +1,5 @@
+from typing import List, Literal, Optional
+
 from pydantic import SecretStr
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -10,6 +12,17 @@ class Settings(BaseSettings):
     login: SecretStr
     password: SecretStr
     database: SecretStr
+    archive_after_days: int = 14
+    template_weeks_ahead: int = 4
+    admin_ids: List[int] = [483131594, 631874013]
+    workers: int = 1
+    shard_socket_dir: str = "/tmp/physhkabot"
+    cache_chat_id: Optional[int] = None
+    drain_timeout: float = 25
+    log_level: str = "INFO"
+    spans_path: Optional[str] = None
+    kv_backend: Literal["memory", "redis"] = "memory"
+    redis_url: str = "redis://localhost:6379/0"
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -1,7 +1,34 @@
-from typing import List, Any
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Set
 
 import asyncpg
 
+from db.resilience import (
+    CONNECTION_ERRORS,
+    CircuitBreaker,
+    DatabaseUnavailable,
+    backoff_delay,
+    is_idempotent,
+)
+from telemetry import Span, span
+
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "physhka_changes"
+RELOAD = "reload"
+
+
+def change_notification(table: str, op: str, column: str = "id") -> str:
+    return f"pg_notify('{CHANGES_CHANNEL}', '{table}:{op}:' || {column})"
+
+
+def reload_notification(table: str) -> str:
+    return f"pg_notify('{CHANGES_CHANNEL}', '{table}:{RELOAD}:')"
+
 
 class DB:
     def __init__(
@@ -12,6 +39,9 @@ class DB:
         password: str,
         database: str,
         pool_size: int = 10,
+        query_timeout: float = 10,
+        acquire_timeout: float = 5,
+        retries: int = 2,
     ):
         self._host = host
         self._port = port
@@ -19,28 +49,172 @@ class DB:
         self._password = password
         self._database = database
         self._pool_size = pool_size
+        self._query_timeout = query_timeout
+        self._acquire_timeout = acquire_timeout
+        self._retries = retries
+        self._breaker = CircuitBreaker()
+        self._dsn = f"postgres://{self._login}:{self._password}@{self._host}:{self._port}/{self._database}"
+        self._listener: Optional[asyncpg.Connection] = None
+        self._channels: Dict[str, List[Callable[[str], Any]]] = defaultdict(list)
+        self._subscribers: Dict[str, List[Callable[[str, str], Any]]] = defaultdict(
+            list
+        )
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._listener_lock = asyncio.Lock()
+        self._listening: Set[str] = set()
+        self._closing = False
 
     async def init(self):
         self._pool = await asyncpg.create_pool(
-            f"postgres://{self._login}:{self._password}@{self._host}:{self._port}/{self._database}"
+            self._dsn, command_timeout=self._query_timeout
         )
 
+    async def close(self):
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._listener is not None:
+            self._listener.remove_termination_listener(self._on_listener_terminated)
+            await self._listener.close()
+        await self._pool.close()
+
+    async def listen(self, channel: str, callback: Callable[[str], Any]):
+        self._channels[channel].append(callback)
+        async with self._listener_lock:
+            if self._listener is None:
+                await self._connect_listener()
+            elif channel not in self._listening:
+                await self._listener.add_listener(channel, self._dispatch)
+                self._listening.add(channel)
+
+    async def subscribe(self, table: str, callback: Callable[[str, str], Any]):
+        self._subscribers[table].append(callback)
+        if CHANGES_CHANNEL not in self._channels:
+            await self.listen(CHANGES_CHANNEL, self._dispatch_change)
+
+    async def _connect_listener(self):
+        self._listener = await asyncpg.connect(self._dsn)
+        self._listener.add_termination_listener(self._on_listener_terminated)
+        self._listening = set()
+        for channel in list(self._channels):
+            await self._listener.add_listener(channel, self._dispatch)
+            self._listening.add(channel)
+
+    def _dispatch(self, connection, pid, channel: str, payload: str):
+        for callback in self._channels[channel]:
+            callback(payload)
+
+    def _dispatch_change(self, payload: str):
+        if payload == RELOAD:
+            for table, callbacks in self._subscribers.items():
+                for callback in callbacks:
+                    callback(RELOAD, "")
+            return
+        table, op, key = payload.split(":", 2)
+        for callback in self._subscribers[table]:
+            callback(op, key)
+
+    def _on_listener_terminated(self, connection):
+        if self._closing:
+            return
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_listener())
+
+    async def _reconnect_listener(self):
+        delay = 1
+        while True:
+            try:
+                async with self._listener_lock:
+                    await self._connect_listener()
+                break
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+        for channel in self._channels:
+            self._dispatch(self._listener, None, channel, RELOAD)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        with span("db.transaction", **{"db.system": "postgresql"}):
+            self._breaker.before_call()
+            started = False
+            try:
+                async with self._pool.acquire(timeout=self._acquire_timeout) as conn:
+                    async with conn.transaction():
+                        started = True
+                        self._breaker.record_success()
+                        yield conn
+            except CONNECTION_ERRORS as error:
+                if started:
+                    raise
+                self._on_connection_error(error)
+                raise DatabaseUnavailable("Database is unavailable") from error
+            except asyncpg.PostgresError:
+                if not started:
+                    self._breaker.record_success()
+                raise
+
+    async def _run(self, method: str, query: str, *params):
+        with span(
+            f"db.{method}",
+            **{"db.system": "postgresql", "db.statement": " ".join(query.split())},
+        ) as current:
+            return await self._run_with_retries(current, method, query, *params)
+
+    async def _run_with_retries(self, current: Span, method: str, query: str, *params):
+        self._breaker.before_call()
+        retry = is_idempotent(query)
+        for attempt in range(self._retries + 1):
+            current.set_attribute("db.attempts", attempt + 1)
+            sent = False
+            try:
+                async with self._pool.acquire(timeout=self._acquire_timeout) as conn:
+                    sent = True
+                    async with conn.transaction():
+                        result = await getattr(conn, method)(
+                            query, *params, timeout=self._query_timeout
+                        )
+            except CONNECTION_ERRORS as error:
+                if sent and isinstance(error, asyncio.TimeoutError):
+                    logger.warning(
+                        "Database query timed out",
+                        extra={"db_method": method, "attempt": attempt + 1},
+                    )
+                    raise DatabaseUnavailable("Database query timed out") from error
+                logger.warning(
+                    "Database call failed",
+                    extra={
+                        "db_method": method,
+                        "attempt": attempt + 1,
+                        "error": repr(error),
+                    },
+                )
+                if attempt < self._retries and (retry or not sent):
+                    if not isinstance(error, asyncio.TimeoutError):
+                        self._pool.expire_connections()
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+                self._on_connection_error(error)
+                raise DatabaseUnavailable("Database is unavailable") from error
+            except asyncpg.PostgresError:
+                self._breaker.record_success()
+                raise
+            self._breaker.record_success()
+            return result
+
+    def _on_connection_error(self, error: Exception):
+        self._breaker.record_failure()
+        if not isinstance(error, asyncio.TimeoutError):
+            self._pool.expire_connections()
+
     async def execute(self, query, *params):
-        async with self._pool.acquire() as conn:
-            async with conn.transaction():
-                return await conn.execute(query, *params)
+        return await self._run("execute", query, *params)
 
     async def fetchrow(self, query, *params) -> List:
-        async with self._pool.acquire() as conn:
-            async with conn.transaction():
-                return await conn.fetchrow(query, *params)
+        return await self._run("fetchrow", query, *params)
 
     async def fetch(self, query, *params) -> List[List]:
-        async with self._pool.acquire() as conn:
-            async with conn.transaction():
-                return await conn.fetch(query, *params)
+        return await self._run("fetch", query, *params)
 
     async def fetchval(self, query, *params) -> Any:
-        async with self._pool.acquire() as conn:
-            async with conn.transaction():
-                return await conn.fetchval(query, *params)
+        return await self._run("fetchval", query, *params)
@@ -0,0 +1,338 @@
+from typing import List, Tuple
+
+import asyncpg
+
+from db.db import DB
+
+MIGRATIONS_TABLE = "schema_migrations"
+MIGRATIONS_LOCK_ID = 74052024
+MIGRATION_TIMEOUT = 600
+
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (
+        1,
+        "initial schema",
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id BIGINT PRIMARY KEY,
+            name TEXT,
+            phone TEXT,
+            emergency_contact TEXT,
+            role TEXT,
+            location TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS events (
+            id SERIAL PRIMARY KEY,
+            description TEXT,
+            date TEXT,
+            location TEXT,
+            tempo TEXT,
+            photo_id TEXT,
+            city TEXT
+        );
+        CREATE INDEX IF NOT EXISTS events_date_idx ON events (date);
+
+        CREATE TABLE IF NOT EXISTS registrations (
+            user_id BIGINT,
+            event_id BIGINT,
+            late INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, event_id)
+        );
+        ALTER TABLE registrations
+            DROP CONSTRAINT IF EXISTS registrations_event_id_fkey,
+            DROP CONSTRAINT IF EXISTS registrations_user_id_fkey,
+            ADD CONSTRAINT registrations_event_id_fkey
+                FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE,
+            ADD CONSTRAINT registrations_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE NOT VALID;
+        CREATE INDEX IF NOT EXISTS registrations_event_id_late_idx
+            ON registrations (event_id, late);
+        """,
+    ),
+    (
+        2,
+        "store event dates as timestamps",
+        """
+        ALTER TABLE events ALTER COLUMN date TYPE TIMESTAMP USING date::timestamp;
+        """,
+    ),
+    (
+        3,
+        "partitioned archive of finished events",
+        """
+        CREATE TABLE IF NOT EXISTS events_archive (
+            id INTEGER NOT NULL,
+            description TEXT,
+            date TIMESTAMP NOT NULL,
+            location TEXT,
+            tempo TEXT,
+            photo_id TEXT,
+            city TEXT,
+            archived_at TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (id, date)
+        ) PARTITION BY RANGE (date);
+        CREATE INDEX IF NOT EXISTS events_archive_id_idx ON events_archive (id);
+
+        CREATE TABLE IF NOT EXISTS registrations_archive (
+            user_id BIGINT NOT NULL,
+            event_id BIGINT NOT NULL,
+            event_date TIMESTAMP NOT NULL,
+            late INTEGER,
+            PRIMARY KEY (user_id, event_id, event_date)
+        ) PARTITION BY RANGE (event_date);
+        CREATE INDEX IF NOT EXISTS registrations_archive_event_id_idx
+            ON registrations_archive (event_id);
+        """,
+    ),
+    (
+        4,
+        "event update stamps",
+        """
+        ALTER TABLE events ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT now();
+        ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+        """,
+    ),
+    (
+        5,
+        "event versions for optimistic locking",
+        """
+        ALTER TABLE events ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+        ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS version INTEGER;
+        """,
+    ),
+    (
+        6,
+        "sent event messages",
+        """
+        CREATE TABLE IF NOT EXISTS event_messages (
+            event_id BIGINT NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+            chat_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            kind TEXT NOT NULL,
+            sent_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (chat_id, message_id)
+        );
+        CREATE INDEX IF NOT EXISTS event_messages_event_id_sent_at_idx
+            ON event_messages (event_id, sent_at);
+        """,
+    ),
+    (
+        7,
+        "attendance and incrementally maintained statistics",
+        """
+        ALTER TABLE registrations ADD COLUMN IF NOT EXISTS attended BOOLEAN NOT NULL DEFAULT false;
+        ALTER TABLE registrations_archive ADD COLUMN IF NOT EXISTS attended BOOLEAN;
+
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id BIGINT PRIMARY KEY,
+            registered INTEGER NOT NULL DEFAULT 0,
+            attended INTEGER NOT NULL DEFAULT 0,
+            cancelled INTEGER NOT NULL DEFAULT 0,
+            late INTEGER NOT NULL DEFAULT 0,
+            late_minutes INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS event_stats (
+            event_id BIGINT PRIMARY KEY,
+            registered INTEGER NOT NULL DEFAULT 0,
+            attended INTEGER NOT NULL DEFAULT 0,
+            cancelled INTEGER NOT NULL DEFAULT 0,
+            late INTEGER NOT NULL DEFAULT 0,
+            late_minutes INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE OR REPLACE FUNCTION apply_registration_stats(
+            p_user_id BIGINT, p_event_id BIGINT, p_sign INTEGER, p_late INTEGER, p_attended BOOLEAN
+        ) RETURNS void AS $$
+        DECLARE
+            v_attended INTEGER := p_sign * COALESCE(p_attended, false)::int;
+            v_cancelled INTEGER := p_sign * (COALESCE(p_late, 0) = -1)::int;
+            v_late INTEGER := p_sign * (COALESCE(p_late, 0) > 0)::int;
+            v_late_minutes INTEGER := p_sign * GREATEST(COALESCE(p_late, 0), 0);
+        BEGIN
+            INSERT INTO user_stats AS s (user_id, registered, attended, cancelled, late, late_minutes)
+            VALUES (p_user_id, p_sign, v_attended, v_cancelled, v_late, v_late_minutes)
+            ON CONFLICT (user_id) DO UPDATE SET
+                registered = s.registered + EXCLUDED.registered,
+                attended = s.attended + EXCLUDED.attended,
+                cancelled = s.cancelled + EXCLUDED.cancelled,
+                late = s.late + EXCLUDED.late,
+                late_minutes = s.late_minutes + EXCLUDED.late_minutes;
+            INSERT INTO event_stats AS s (event_id, registered, attended, cancelled, late, late_minutes)
+            VALUES (p_event_id, p_sign, v_attended, v_cancelled, v_late, v_late_minutes)
+            ON CONFLICT (event_id) DO UPDATE SET
+                registered = s.registered + EXCLUDED.registered,
+                attended = s.attended + EXCLUDED.attended,
+                cancelled = s.cancelled + EXCLUDED.cancelled,
+                late = s.late + EXCLUDED.late,
+                late_minutes = s.late_minutes + EXCLUDED.late_minutes;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION registrations_stats_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('physhka.archiving', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE'
+                AND OLD.late IS NOT DISTINCT FROM NEW.late
+                AND OLD.attended IS NOT DISTINCT FROM NEW.attended THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM apply_registration_stats(OLD.user_id, OLD.event_id, -1, OLD.late, OLD.attended);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM apply_registration_stats(NEW.user_id, NEW.event_id, 1, NEW.late, NEW.attended);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS registrations_stats ON registrations;
+        CREATE TRIGGER registrations_stats
+            AFTER INSERT OR UPDATE OR DELETE ON registrations
+            FOR EACH ROW EXECUTE FUNCTION registrations_stats_trigger();
+
+        TRUNCATE user_stats, event_stats;
+        INSERT INTO user_stats (user_id, registered, attended, cancelled, late, late_minutes)
+        SELECT
+            user_id,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE attended),
+            COUNT(*) FILTER (WHERE late = -1),
+            COUNT(*) FILTER (WHERE late > 0),
+            COALESCE(SUM(late) FILTER (WHERE late > 0), 0)
+        FROM (
+            SELECT user_id, late, attended FROM registrations
+            UNION ALL
+            SELECT user_id, late, attended FROM registrations_archive
+        ) AS all_registrations
+        GROUP BY user_id;
+        INSERT INTO event_stats (event_id, registered, attended, cancelled, late, late_minutes)
+        SELECT
+            event_id,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE attended),
+            COUNT(*) FILTER (WHERE late = -1),
+            COUNT(*) FILTER (WHERE late > 0),
+            COALESCE(SUM(late) FILTER (WHERE late > 0), 0)
+        FROM (
+            SELECT event_id, late, attended FROM registrations
+            UNION ALL
+            SELECT event_id, late, attended FROM registrations_archive
+        ) AS all_registrations
+        GROUP BY event_id;
+        """,
+    ),
+    (
+        8,
+        "trigram indexes for event search",
+        """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS events_description_trgm_idx
+            ON events USING gin (description gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS events_location_trgm_idx
+            ON events USING gin (location gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS events_city_date_idx ON events (city, date);
+        CREATE INDEX IF NOT EXISTS events_archive_description_trgm_idx
+            ON events_archive USING gin (description gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS events_archive_location_trgm_idx
+            ON events_archive USING gin (location gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS events_archive_city_date_idx
+            ON events_archive (city, date);
+        """,
+    ),
+    (
+        9,
+        "recurring event templates",
+        """
+        CREATE TABLE IF NOT EXISTS event_templates (
+            id SERIAL PRIMARY KEY,
+            city TEXT,
+            description TEXT,
+            weekday SMALLINT NOT NULL CHECK (weekday BETWEEN 0 AND 6),
+            start_time TIME NOT NULL,
+            location TEXT,
+            tempo TEXT,
+            photo_id TEXT,
+            active BOOLEAN NOT NULL DEFAULT true,
+            materialized_until TIMESTAMP,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        ALTER TABLE events ADD COLUMN IF NOT EXISTS template_id INTEGER
+            REFERENCES event_templates (id) ON DELETE SET NULL;
+        CREATE UNIQUE INDEX IF NOT EXISTS events_template_id_date_idx
+            ON events (template_id, date);
+        """,
+    ),
+    (
+        10,
+        "all photo sizes of an event",
+        """
+        ALTER TABLE events ADD COLUMN IF NOT EXISTS photo_ids TEXT[];
+        ALTER TABLE events_archive ADD COLUMN IF NOT EXISTS photo_ids TEXT[];
+        ALTER TABLE event_templates ADD COLUMN IF NOT EXISTS photo_ids TEXT[];
+        """,
+    ),
+    (
+        11,
+        "member signup time",
+        """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS created_at TIMESTAMP;
+        ALTER TABLE users ALTER COLUMN created_at SET DEFAULT now();
+        CREATE INDEX IF NOT EXISTS users_created_at_idx ON users (created_at);
+        """,
+    ),
+    (
+        12,
+        "member directory indexes",
+        """
+        CREATE INDEX IF NOT EXISTS users_name_id_idx ON users ((COALESCE(name, '')), id);
+        CREATE INDEX IF NOT EXISTS users_name_trgm_idx ON users USING gin (name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS users_phone_trgm_idx ON users USING gin (phone gin_trgm_ops);
+        """,
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def current_version(db: DB) -> int:
+    try:
+        return await db.fetchval(f"SELECT max(version) FROM {MIGRATIONS_TABLE}") or 0
+    except asyncpg.UndefinedTableError:
+        return 0
+
+
+async def migrate(db: DB):
+    if await current_version(db) >= LATEST_VERSION:
+        return
+
+    async with db.transaction() as conn:
+        await conn.execute(
+            "SELECT pg_advisory_xact_lock($1)",
+            MIGRATIONS_LOCK_ID,
+            timeout=MIGRATION_TIMEOUT,
+        )
+        await conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name TEXT,
+                applied_at TIMESTAMP DEFAULT now()
+            )
+            """
+        )
+        applied = (
+            await conn.fetchval(f"SELECT max(version) FROM {MIGRATIONS_TABLE}") or 0
+        )
+        for version, name, sql in MIGRATIONS:
+            if version <= applied:
+                continue
+            await conn.execute(sql, timeout=MIGRATION_TIMEOUT)
+            await conn.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES ($1, $2)",
+                version,
+                name,
+            )
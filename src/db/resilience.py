@@ -0,0 +1,57 @@
+import asyncio
+import random
+import time
+
+import asyncpg
+
+
+CONNECTION_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.AdminShutdownError,
+    asyncpg.CrashShutdownError,
+    asyncpg.TooManyConnectionsError,
+)
+
+
+class DatabaseUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self):
+        if self._opened_at is None:
+            return
+        now = time.monotonic()
+        if now - self._opened_at < self._reset_timeout:
+            raise DatabaseUnavailable("Database circuit is open")
+        self._opened_at = now
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float = 0.1, cap: float = 2) -> float:
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def is_idempotent(query: str) -> bool:
+    return query.lstrip().upper().startswith("SELECT")
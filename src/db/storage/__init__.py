@@ -1,3 +1,7 @@
 from .users import User, UsersStorage
 from .events import Event, EventsStorage
 from .registrations import Registration, RegistrationsStorage
+from .event_messages import EventMessage, EventMessagesStorage
+from .stats import Stats, StatsStorage
+from .templates import EventTemplate, EventTemplatesStorage
+from .dashboard import Dashboard, DashboardStorage
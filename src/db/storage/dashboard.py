@@ -0,0 +1,74 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List
+
+import asyncpg
+
+from db.db import DB
+from kv import KV
+from telemetry import trace_methods
+
+
+@dataclass(slots=True)
+class Dashboard:
+    columns = ("members", "upcoming", "growth")
+
+    members: List[dict]
+    upcoming: List[dict]
+    growth: List[dict]
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "Dashboard":
+        return cls(*(json.loads(value) for value in record))
+
+
+@trace_methods
+class DashboardStorage:
+    __cache_key = "dashboard"
+
+    def __init__(self, db: DB, kv: KV, ttl: float = 60):
+        self._db = db
+        self._kv = kv
+        self._ttl = ttl
+
+    async def get(self, upcoming_limit: int = 10, growth_weeks: int = 8) -> Dashboard:
+        cached = await self._kv.get(self.__cache_key)
+        if cached is not None:
+            return Dashboard(*json.loads(cached))
+        data = await self._db.fetchrow(
+            """
+            WITH members AS (
+                SELECT location AS city, role, COUNT(*) AS amount
+                FROM users
+                GROUP BY location, role
+            ), upcoming AS (
+                SELECT e.id, e.date, e.city, e.location, COUNT(r.user_id) AS signups
+                FROM events e
+                LEFT JOIN registrations r ON r.event_id = e.id AND r.late <> -1
+                WHERE e.date > $1
+                GROUP BY e.id
+                ORDER BY e.date
+                LIMIT $2
+            ), growth AS (
+                SELECT date_trunc('week', created_at)::date AS week, COUNT(*) AS amount
+                FROM users
+                WHERE created_at >= date_trunc('week', $1::timestamp) - make_interval(weeks => $3 - 1)
+                GROUP BY 1
+            )
+            SELECT
+                (SELECT COALESCE(json_agg(members ORDER BY city, role), '[]') FROM members),
+                (SELECT COALESCE(json_agg(upcoming ORDER BY date), '[]') FROM upcoming),
+                (SELECT COALESCE(json_agg(growth ORDER BY week), '[]') FROM growth)
+            """,
+            datetime.now(),
+            upcoming_limit,
+            growth_weeks,
+        )
+        dashboard = Dashboard.from_record(data)
+        await self._kv.set(
+            self.__cache_key,
+            json.dumps([getattr(dashboard, column) for column in Dashboard.columns]),
+            self._ttl,
+        )
+        return dashboard
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+import asyncpg
+
+from db.db import DB
+from telemetry import trace_methods
+
+
+@dataclass(slots=True)
+class EventMessage:
+    ADMIN = "admin"
+    CREATED = "created"
+    SIGNUP = "signup"
+    FEED = "feed"
+
+    columns = ("event_id", "chat_id", "message_id", "kind", "sent_at")
+
+    event_id: int
+    chat_id: int
+    message_id: int
+    kind: str
+    sent_at: datetime
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "EventMessage":
+        return cls(*record)
+
+
+@trace_methods
+class EventMessagesStorage:
+    __table = "event_messages"
+    __columns = ", ".join(EventMessage.columns)
+
+    def __init__(self, db: DB):
+        self._db = db
+
+    async def record(self, messages: Iterable[Tuple[int, int, int, str]]):
+        async with self._db.transaction() as conn:
+            await conn.executemany(
+                f"""
+                INSERT INTO {self.__table} (event_id, chat_id, message_id, kind)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT DO NOTHING
+                """,
+                messages,
+            )
+
+    async def get_sent_since(
+        self, event_id: int, since: datetime
+    ) -> List[EventMessage]:
+        data = await self._db.fetch(
+            f"""
+            SELECT {self.__columns} FROM {self.__table}
+            WHERE event_id = $1 AND sent_at > $2
+            ORDER BY chat_id, message_id
+            """,
+            event_id,
+            since,
+        )
+        return [EventMessage.from_record(row) for row in data]
+
+    async def forget(self, chat_id: int, message_id: int):
+        await self._db.execute(
+            f"DELETE FROM {self.__table} WHERE chat_id = $1 AND message_id = $2",
+            chat_id,
+            message_id,
+        )
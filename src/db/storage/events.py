@@ -1,11 +1,20 @@
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
-from datetime import datetime
-from db.db import DB
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from db.db import DB, RELOAD, change_notification, reload_notification
 from db.storage.registrations import RegistrationsStorage
+from db.storage.event_messages import EventMessagesStorage
+from db.storage.dashboard import DashboardStorage
+from db.storage.stats import StatsStorage
+from db.storage.templates import EventTemplatesStorage
+from kv import KV, dump_record, load_record
+from telemetry import trace_methods
 
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     city: str
     description: str
@@ -14,66 +23,148 @@ class Event:
     tempo: str
     photo_id: str
     id: int = field(default=None)
+    updated_at: datetime = field(default=None)
+    version: int = field(default=None)
+    photo_ids: List[str] = field(default=None)
+
+    PREVIEW_SIZE_INDEX = 2
 
-    russian_days = {
-        "Mon": "Понедельник",
-        "Tue": "Вторник",
-        "Wed": "Среда",
-        "Thu": "Четверг",
-        "Fri": "Пятница",
-        "Sat": "Суббота",
-        "Sun": "Воскресенье",
-    }
+    columns = (
+        "city",
+        "description",
+        "date",
+        "location",
+        "tempo",
+        "photo_id",
+        "id",
+        "updated_at",
+        "version",
+        "photo_ids",
+    )
+
+    def photo_sizes(self, preview: bool = False) -> List[str]:
+        sizes = self.photo_ids or [self.photo_id]
+        preferred = (
+            sizes[min(self.PREVIEW_SIZE_INDEX, len(sizes) - 1)]
+            if preview
+            else sizes[-1]
+        )
+        return [preferred] + [size for size in reversed(sizes) if size != preferred]
 
-    def __str__(self):
-        return f"{self.description}\n\n{self.russian_days[self.date.strftime('%a')]} {self.date.strftime('%d.%m в %H:%M')}\n\n📍{self.location}\n{self.tempo}\n\nДо старта 🏃‍➡️"
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "Event":
+        return cls(*record)
 
 
+@trace_methods
 class EventsStorage:
     __table = "events"
+    __archive_table = "events_archive"
+    __columns = ", ".join(Event.columns)
+    editable_fields = (
+        "city",
+        "description",
+        "date",
+        "location",
+        "tempo",
+        "photo_id",
+        "photo_ids",
+    )
 
-    def __init__(self, db: DB):
+    __cache_prefix = "event:"
+
+    def __init__(self, db: DB, kv: KV, cache_ttl: float = 300):
         self._db = db
+        self._kv = kv
+        self._cache_ttl = cache_ttl
         self.registrations = RegistrationsStorage(db)
+        self.messages = EventMessagesStorage(db)
+        self.stats = StatsStorage(db)
+        self.templates = EventTemplatesStorage(db)
+        self.dashboard = DashboardStorage(db, kv)
 
     async def init(self):
-        await self._db.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.__table} (
-                id SERIAL PRIMARY KEY,
-                description TEXT,
-                date TEXT,
-                location TEXT,
-                tempo TEXT,
-                photo_id TEXT,
-                city TEXT
-            )
-            """
-        )
+        await self._db.subscribe(self.__table, self._on_change)
+
+    async def subscribe(self, callback: Callable[[str, str], Any]):
+        await self._db.subscribe(self.__table, callback)
+
+    def _on_change(self, op: str, key: str):
+        if op == RELOAD or not key:
+            self._kv.discard_prefix(self.__cache_prefix)
+        else:
+            self._kv.discard(self._cache_key(int(key)))
+
+    def _cache_key(self, event_id: int) -> str:
+        return f"{self.__cache_prefix}{event_id}"
 
-    async def get_by_id(self, event_id: int) -> Event:
+    def _source(self, include_history: bool) -> str:
+        if not include_history:
+            return self.__table
+        return f"""(
+            SELECT {self.__columns} FROM {self.__table}
+            UNION ALL
+            SELECT {self.__columns} FROM {self.__archive_table}
+        ) AS {self.__table}"""
+
+    async def get_by_id(self, event_id: int, include_history: bool = False) -> Event:
+        cached = await self._kv.get(self._cache_key(event_id))
+        if cached is not None:
+            return load_record(Event, cached)
         data = await self._db.fetchrow(
-            f"SELECT id, city, description, date, location, tempo, photo_id FROM {self.__table} WHERE id = $1",
+            f"SELECT {self.__columns} FROM {self._source(include_history)} WHERE id = $1",
             event_id,
         )
         if data is None:
             return None
-        return Event(
-            id=data[0],
-            city=data[1],
-            description=data[2],
-            date=data[3],
-            location=data[4],
-            tempo=data[5],
-            photo_id=data[6],
+        event = Event.from_record(data)
+        if not include_history:
+            await self._kv.set(
+                self._cache_key(event_id), dump_record(event), self._cache_ttl
+            )
+        return event
+
+    async def get_many(
+        self, event_ids: List[int], include_history: bool = False
+    ) -> Dict[int, Event]:
+        cached = await self._kv.mget(
+            [self._cache_key(event_id) for event_id in event_ids]
         )
+        events = {
+            event_id: load_record(Event, value)
+            for event_id, value in zip(event_ids, cached)
+            if value is not None
+        }
+        missing = [event_id for event_id in event_ids if event_id not in events]
+        if missing:
+            data = await self._db.fetch(
+                f"""
+                SELECT {self.__columns} FROM {self._source(include_history)}
+                WHERE id = ANY($1::bigint[])
+                """,
+                missing,
+            )
+            fetched = [Event.from_record(row) for row in data]
+            if not include_history:
+                await self._kv.mset(
+                    {
+                        self._cache_key(event.id): dump_record(event)
+                        for event in fetched
+                    },
+                    self._cache_ttl,
+                )
+            events.update((event.id, event) for event in fetched)
+        return events
 
     async def create(self, event: Event) -> int:
         return await self._db.fetchval(
             f"""
-            INSERT INTO {self.__table} (city, description, date, location, tempo, photo_id) 
-            VALUES ($1, $2, $3, $4, $5, $6)
-            RETURNING id
+            WITH created AS (
+                INSERT INTO {self.__table} (city, description, date, location, tempo, photo_id, photo_ids)
+                VALUES ($1, $2, $3, $4, $5, $6, $7)
+                RETURNING id
+            )
+            SELECT id, {change_notification(self.__table, "insert")} FROM created
         """,
             event.city,
             event.description,
@@ -81,64 +172,170 @@ class EventsStorage:
             event.location,
             event.tempo,
             event.photo_id,
+            event.photo_ids,
+        )
+
+    async def update_fields(
+        self, event_id: int, version: int, **fields
+    ) -> Optional[Event]:
+        unknown = fields.keys() - set(self.editable_fields)
+        if unknown:
+            raise ValueError(f"Fields can not be edited: {', '.join(unknown)}")
+        assignments = ", ".join(
+            f"{name} = ${index}" for index, name in enumerate(fields, start=3)
+        )
+        await self._kv.delete(self._cache_key(event_id))
+        data = await self._db.fetchrow(
+            f"""
+            WITH updated AS (
+                UPDATE {self.__table}
+                SET {assignments}, updated_at = now(), version = version + 1
+                WHERE id = $1 AND version = $2
+                RETURNING {self.__columns}
+            )
+            SELECT {self.__columns}, {change_notification(self.__table, "update")}
+            FROM updated
+        """,
+            event_id,
+            version,
+            *fields.values(),
         )
+        return Event.from_record(data[: len(Event.columns)]) if data else None
 
-    async def update(self, event: Event):
+    async def drop_photo_size(self, event_id: int, file_id: str):
+        await self._kv.delete(self._cache_key(event_id))
         await self._db.execute(
             f"""
-            UPDATE {self.__table} SET city = $1, description = $2, date = $3, location = $4, tempo = $5, photo_id = $6 WHERE id = $7
+            WITH updated AS (
+                UPDATE {self.__table}
+                SET photo_ids = array_remove(photo_ids, $2),
+                    photo_id = CASE WHEN photo_id = $2
+                        THEN (array_remove(photo_ids, $2))[cardinality(photo_ids) - 1]
+                        ELSE photo_id END
+                WHERE id = $1 AND $2 = ANY(photo_ids) AND cardinality(photo_ids) > 1
+                RETURNING id
+            )
+            SELECT {change_notification(self.__table, "update")} FROM updated
         """,
-            event.city,
-            event.description,
-            event.date,
-            event.location,
-            event.tempo,
-            event.photo_id,
-            event.id,
+            event_id,
+            file_id,
         )
 
     async def get_all_events(
-        self, city: str = None, actual_only: bool = False
+        self, city: str = None, actual_only: bool = False, include_history: bool = False
     ) -> List[Event]:
-        query = f"""
-            SELECT id, city, description, date, location, tempo, photo_id 
-            FROM {self.__table}
-            WHERE 1=1
-            {f"AND date > $1" if actual_only else ""}
-            {f"AND $2 LIKE '%' || city || '%'" if city else ""}
-            ORDER BY date ASC
-        """
         params = []
         if actual_only:
             params.append(datetime.now())
         if city:
             params.append(city)
+        query = f"""
+            SELECT {self.__columns}
+            FROM {self._source(include_history)}
+            WHERE 1=1
+            {f"AND date > $1" if actual_only else ""}
+            {f"AND ${len(params)} LIKE '%' || city || '%'" if city else ""}
+            ORDER BY date ASC
+        """
         data = await self._db.fetch(query, *params)
         if not data:
             return []
-        return [
-            Event(
-                city=row[1],
-                description=row[2],
-                date=row[3],
-                location=row[4],
-                tempo=row[5],
-                photo_id=row[6],
-                id=row[0],
+        return [Event.from_record(row) for row in data]
+
+    async def search_events(
+        self,
+        text: str = None,
+        city: str = None,
+        date_from: datetime = None,
+        date_to: datetime = None,
+        include_history: bool = True,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> Tuple[List[Event], int]:
+        conditions = []
+        params = []
+        if text:
+            params.append(text)
+            conditions.append(
+                f"(description ILIKE '%' || ${len(params)} || '%' OR location ILIKE '%' || ${len(params)} || '%')"
             )
-            for row in data
+        if city:
+            params.append(city)
+            conditions.append(f"city = ${len(params)}")
+        if date_from:
+            params.append(date_from)
+            conditions.append(f"date >= ${len(params)}")
+        if date_to:
+            params.append(date_to)
+            conditions.append(f"date < ${len(params)}")
+        params.extend((limit, offset))
+        data = await self._db.fetch(
+            f"""
+            SELECT {self.__columns}, count(*) OVER ()
+            FROM {self._source(include_history)}
+            WHERE {" AND ".join(conditions) or "true"}
+            ORDER BY date DESC, id DESC
+            LIMIT ${len(params) - 1} OFFSET ${len(params)}
+        """,
+            *params,
+        )
+        if not data:
+            return [], 0
+        return [Event.from_record(row[: len(Event.columns)]) for row in data], data[0][
+            -1
         ]
 
     async def get_event_amount(self) -> int:
         return await self._db.fetchval(f"SELECT COUNT(*) FROM {self.__table}")
 
     async def delete(self, event_id: int):
-        await self._db.execute(
-            f"""
-            DELETE FROM {self.__table} WHERE id = $1
-        """,
-            event_id,
-        )
+        await self._kv.delete(self._cache_key(event_id))
+        async with self._db.transaction() as conn:
+            await conn.execute(
+                f"""
+                WITH deleted AS (
+                    DELETE FROM {self.__table} WHERE id = $1 RETURNING id
+                )
+                SELECT {change_notification(self.__table, "delete")} FROM deleted
+            """,
+                event_id,
+            )
+            await self.stats.forget_event(conn, event_id)
+
+    async def archive_finished(self, keep_days: int = 14) -> int:
+        threshold = datetime.now() - timedelta(days=keep_days)
+        async with self._db.transaction() as conn:
+            years = await conn.fetch(
+                f"SELECT DISTINCT extract(year FROM date)::int FROM {self.__table} WHERE date < $1",
+                threshold,
+            )
+            for (year,) in years:
+                await self._create_archive_partitions(conn, year)
+            await self.registrations.archive(conn, threshold)
+            await conn.execute(f"SELECT {reload_notification(self.__table)}")
+            return await conn.fetchval(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {self.__table} WHERE date < $1
+                    RETURNING {self.__columns}
+                ), archived AS (
+                    INSERT INTO {self.__archive_table} ({self.__columns})
+                    SELECT * FROM moved
+                    RETURNING id
+                )
+                SELECT COUNT(*) FROM archived
+            """,
+                threshold,
+            )
+
+    async def _create_archive_partitions(self, conn, year: int):
+        for table in (self.__archive_table, self.registrations.archive_table):
+            await conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table}_{year} PARTITION OF {table}
+                FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+            """
+            )
 
     async def register_user(self, user_id: int, event_id: int):
         await self.registrations.register(user_id, event_id)
@@ -149,16 +346,23 @@ class EventsStorage:
     async def is_user_registered(self, user_id: int, event_id: int) -> bool:
         return await self.registrations.is_registered(user_id, event_id)
 
-    async def get_event_participants(self, event_id: int) -> List[int]:
-        return await self.registrations.get_event_registrations(event_id)
+    async def get_event_participants(
+        self, event_id: int, include_history: bool = False
+    ) -> List[int]:
+        return await self.registrations.get_event_registrations(
+            event_id, include_history=include_history
+        )
 
     async def get_user_events(
-        self, user_id: int, actual_only: bool = False
+        self, user_id: int, actual_only: bool = False, include_history: bool = False
     ) -> List[Event]:
-        registrations_ids = await self.registrations.get_user_registrations(user_id)
-        events = []
-        for registration_id in registrations_ids:
-            event = await self.get_by_id(registration_id)
-            if event and (not actual_only or event.date > datetime.now()):
-                events.append(event)
-        return events
+        registrations_ids = await self.registrations.get_user_registrations(
+            user_id, include_history=include_history
+        )
+        events = await self.get_many(registrations_ids, include_history=include_history)
+        now = datetime.now()
+        return [
+            events[event_id]
+            for event_id in registrations_ids
+            if event_id in events and (not actual_only or events[event_id].date > now)
+        ]
@@ -1,41 +1,52 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 
-from db.db import DB
+import asyncpg
 
+from db.db import DB, change_notification, reload_notification
+from db.storage.users import User
+from telemetry import trace_methods
 
-@dataclass
+
+@dataclass(slots=True)
 class Registration:
+    columns = ("user_id", "event_id", "late", "attended")
+
     user_id: int
     event_id: int
     late: int
+    attended: bool = False
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "Registration":
+        return cls(*record)
 
 
+@trace_methods
 class RegistrationsStorage:
     __table = "registrations"
+    archive_table = "registrations_archive"
+    export_columns = ("user_id", "name", "phone", "emergency_contact", "late")
+    import_columns = ("user_id", "event_id", "late")
+    __columns = ", ".join(Registration.columns)
 
     def __init__(self, db: DB):
         self._db = db
 
-    async def init(self):
-        await self._db.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.__table} (
-                user_id BIGINT,
-                event_id BIGINT,
-                late INTEGER DEFAULT 0,
-                PRIMARY KEY (user_id, event_id),
-                FOREIGN KEY (event_id) REFERENCES events(id)
-            )
-            """
-        )
+    async def subscribe(self, callback: Callable[[str, str], Any]):
+        await self._db.subscribe(self.__table, callback)
 
     async def register(self, user_id: int, event_id: int):
         await self._db.execute(
             f"""
-            INSERT INTO {self.__table} (user_id, event_id)
-            VALUES ($1, $2)
-            ON CONFLICT DO NOTHING
+            WITH created AS (
+                INSERT INTO {self.__table} (user_id, event_id)
+                VALUES ($1, $2)
+                ON CONFLICT DO NOTHING
+                RETURNING event_id
+            )
+            SELECT {change_notification(self.__table, "insert", "event_id")} FROM created
             """,
             user_id,
             event_id,
@@ -44,8 +55,12 @@ class RegistrationsStorage:
     async def unregister(self, user_id: int, event_id: int):
         await self._db.execute(
             f"""
-            DELETE FROM {self.__table}
-            WHERE user_id = $1 AND event_id = $2
+            WITH deleted AS (
+                DELETE FROM {self.__table}
+                WHERE user_id = $1 AND event_id = $2
+                RETURNING event_id
+            )
+            SELECT {change_notification(self.__table, "delete", "event_id")} FROM deleted
             """,
             user_id,
             event_id,
@@ -56,50 +71,154 @@ class RegistrationsStorage:
     ) -> Optional[Registration]:
         data = await self._db.fetchrow(
             f"""
-            SELECT user_id, event_id, late FROM {self.__table}
+            SELECT {self.__columns} FROM {self.__table}
             WHERE user_id = $1 AND event_id = $2
             """,
             user_id,
             event_id,
         )
-        return Registration(*data) if data else None
+        return Registration.from_record(data) if data else None
 
-    async def get_event_registrations(self, event_id: int) -> List[int]:
+    async def get_event_registrations(
+        self, event_id: int, include_history: bool = False
+    ) -> List[int]:
+        query = f"SELECT user_id FROM {self.__table} WHERE event_id = $1"
+        if include_history:
+            query += f" UNION ALL SELECT user_id FROM {self.archive_table} WHERE event_id = $1"
+        data = await self._db.fetch(query, event_id)
+        return [row[0] for row in data]
+
+    async def get_event_lates(self, event_id: int) -> Dict[int, int]:
         data = await self._db.fetch(
-            f"""
-            SELECT user_id FROM {self.__table}
-            WHERE event_id = $1
-            """,
+            f"SELECT user_id, late FROM {self.__table} WHERE event_id = $1",
             event_id,
         )
+        return {row[0]: row[1] for row in data}
+
+    async def get_user_registrations(
+        self, user_id: int, include_history: bool = False
+    ) -> List[int]:
+        query = f"SELECT event_id FROM {self.__table} WHERE user_id = $1"
+        if include_history:
+            query += f" UNION ALL SELECT event_id FROM {self.archive_table} WHERE user_id = $1"
+        data = await self._db.fetch(query, user_id)
         return [row[0] for row in data]
 
-    async def get_user_registrations(self, user_id: int) -> List[int]:
-        data = await self._db.fetch(
+    async def archive(self, conn, threshold: datetime):
+        await conn.execute("SELECT set_config('physhka.archiving', 'on', true)")
+        await conn.execute(
             f"""
-            SELECT event_id FROM {self.__table}
-            WHERE user_id = $1
+            WITH moved AS (
+                DELETE FROM {self.__table} r USING events e
+                WHERE r.event_id = e.id AND e.date < $1
+                RETURNING r.user_id, r.event_id, e.date, r.late, r.attended
+            )
+            INSERT INTO {self.archive_table} (user_id, event_id, event_date, late, attended)
+            SELECT * FROM moved
             """,
-            user_id,
+            threshold,
         )
-        return [row[0] for row in data]
 
     async def set_late(self, user_id: int, event_id: int, late: int):
         await self._db.execute(
             f"""
-            UPDATE {self.__table} SET late = $3 WHERE user_id = $1 AND event_id = $2
+            WITH updated AS (
+                UPDATE {self.__table} SET late = $3
+                WHERE user_id = $1 AND event_id = $2
+                RETURNING event_id
+            )
+            SELECT {change_notification(self.__table, "update", "event_id")} FROM updated
             """,
             user_id,
             event_id,
             late,
         )
 
+    async def toggle_attended(self, user_id: int, event_id: int) -> Optional[bool]:
+        return await self._db.fetchval(
+            f"""
+            WITH updated AS (
+                UPDATE {self.__table} SET attended = NOT attended
+                WHERE user_id = $1 AND event_id = $2
+                RETURNING event_id, attended
+            )
+            SELECT attended, {change_notification(self.__table, "update", "event_id")}
+            FROM updated
+            """,
+            user_id,
+            event_id,
+        )
+
+    async def get_event_roster(self, event_id: int) -> List[Tuple[User, Registration]]:
+        user_columns = ", ".join(f"u.{column}" for column in User.columns)
+        registration_columns = ", ".join(
+            f"r.{column}" for column in Registration.columns
+        )
+        data = await self._db.fetch(
+            f"""
+            SELECT {user_columns}, {registration_columns}
+            FROM {self.__table} r JOIN users u ON u.id = r.user_id
+            WHERE r.event_id = $1
+            ORDER BY u.name, u.id
+            """,
+            event_id,
+        )
+        split = len(User.columns)
+        return [
+            (User.from_record(row[:split]), Registration.from_record(row[split:]))
+            for row in data
+        ]
+
     async def get_registration(
         self, user_id: int, event_id: int
     ) -> Optional[Registration]:
         data = await self._db.fetchrow(
-            f"SELECT user_id, event_id, late FROM {self.__table} WHERE user_id = $1 AND event_id = $2",
+            f"SELECT {self.__columns} FROM {self.__table} WHERE user_id = $1 AND event_id = $2",
             user_id,
             event_id,
         )
-        return Registration(*data) if data else None
+        return Registration.from_record(data) if data else None
+
+    async def iter_event_roster(
+        self, event_id: int, prefetch: int = 500
+    ) -> AsyncIterator[asyncpg.Record]:
+        async with self._db.transaction() as conn:
+            async for row in conn.cursor(
+                f"""
+                SELECT r.user_id, u.name, u.phone, u.emergency_contact, r.late
+                FROM {self.__table} r JOIN users u ON u.id = r.user_id
+                WHERE r.event_id = $1
+                ORDER BY u.name
+                """,
+                event_id,
+                prefetch=prefetch,
+            ):
+                yield row
+
+    async def import_registrations(self, records: Iterable[tuple]) -> int:
+        async with self._db.transaction() as conn:
+            await conn.execute(
+                f"""
+                CREATE TEMP TABLE {self.__table}_import (
+                    user_id BIGINT, event_id BIGINT, late INTEGER
+                ) ON COMMIT DROP
+                """
+            )
+            await conn.copy_records_to_table(
+                f"{self.__table}_import", records=records, columns=self.import_columns
+            )
+            await conn.execute(f"SELECT {reload_notification(self.__table)}")
+            return await conn.fetchval(
+                f"""
+                WITH inserted AS (
+                    INSERT INTO {self.__table} (user_id, event_id, late)
+                    SELECT i.user_id, i.event_id, COALESCE(i.late, 0)
+                    FROM {self.__table}_import i
+                    JOIN users u ON u.id = i.user_id
+                    JOIN events e ON e.id = i.event_id
+                    ON CONFLICT DO NOTHING
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM inserted
+                """
+            )
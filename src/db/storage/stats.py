@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import List
+
+import asyncpg
+
+from db.db import DB
+from telemetry import trace_methods
+
+
+@dataclass(slots=True)
+class Stats:
+    columns = ("key", "registered", "attended", "cancelled", "late", "late_minutes")
+
+    key: int
+    registered: int
+    attended: int
+    cancelled: int
+    late: int
+    late_minutes: int
+
+    @property
+    def cancel_rate(self) -> float:
+        return self.cancelled / self.registered if self.registered else 0.0
+
+    @property
+    def average_lateness(self) -> float:
+        return self.late_minutes / self.late if self.late else 0.0
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "Stats":
+        return cls(*record)
+
+
+@trace_methods
+class StatsStorage:
+    __users_table = "user_stats"
+    __events_table = "event_stats"
+    __columns = ", ".join(Stats.columns[1:])
+
+    def __init__(self, db: DB):
+        self._db = db
+
+    async def get_user_stats(self, user_id: int) -> Stats:
+        data = await self._db.fetchrow(
+            f"SELECT user_id, {self.__columns} FROM {self.__users_table} WHERE user_id = $1",
+            user_id,
+        )
+        return Stats.from_record(data) if data else Stats(user_id, 0, 0, 0, 0, 0)
+
+    async def get_events_stats(self, event_ids: List[int]) -> List[Stats]:
+        data = await self._db.fetch(
+            f"""
+            SELECT event_id, {self.__columns} FROM {self.__events_table}
+            WHERE event_id = ANY($1::bigint[])
+            """,
+            event_ids,
+        )
+        return [Stats.from_record(row) for row in data]
+
+    async def forget_event(self, conn, event_id: int):
+        await conn.execute(
+            f"DELETE FROM {self.__events_table} WHERE event_id = $1", event_id
+        )
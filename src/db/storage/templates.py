@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from typing import List, Optional
+
+import asyncpg
+
+from db.db import DB, change_notification
+from telemetry import trace_methods
+
+
+@dataclass(slots=True)
+class EventTemplate:
+    columns = (
+        "city",
+        "description",
+        "weekday",
+        "start_time",
+        "location",
+        "tempo",
+        "photo_id",
+        "id",
+        "active",
+    )
+
+    city: str
+    description: str
+    weekday: int
+    start_time: time
+    location: str
+    tempo: str
+    photo_id: str
+    id: int = field(default=None)
+    active: bool = field(default=True)
+
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "EventTemplate":
+        return cls(*record)
+
+
+@trace_methods
+class EventTemplatesStorage:
+    __table = "event_templates"
+    __events_table = "events"
+    __columns = ", ".join(EventTemplate.columns)
+
+    def __init__(self, db: DB):
+        self._db = db
+
+    async def create_from_event(self, event_id: int) -> Optional[int]:
+        return await self._db.fetchval(
+            f"""
+            INSERT INTO {self.__table} (city, description, weekday, start_time, location, tempo, photo_id, photo_ids, materialized_until)
+            SELECT city, description, extract(isodow FROM date)::int - 1, date::time, location, tempo, photo_id, photo_ids, date
+            FROM {self.__events_table} WHERE id = $1
+            RETURNING id
+            """,
+            event_id,
+        )
+
+    async def get_active(self) -> List[EventTemplate]:
+        data = await self._db.fetch(
+            f"""
+            SELECT {self.__columns} FROM {self.__table}
+            WHERE active ORDER BY weekday, start_time
+            """
+        )
+        return [EventTemplate.from_record(row) for row in data]
+
+    async def deactivate(self, template_id: int) -> bool:
+        return (
+            await self._db.fetchval(
+                f"""
+            UPDATE {self.__table} SET active = false
+            WHERE id = $1 AND active
+            RETURNING true
+            """,
+                template_id,
+            )
+            or False
+        )
+
+    async def materialize(self, weeks: int, now: datetime = None) -> int:
+        now = now or datetime.now()
+        data = await self._db.fetch(
+            f"""
+            WITH horizon AS (
+                SELECT date_trunc('day', $1::timestamp) + make_interval(weeks => $2) AS until
+            ), slots AS (
+                SELECT t.id, t.city, t.description, d.day + t.start_time AS date, t.location, t.tempo, t.photo_id, t.photo_ids
+                FROM {self.__table} t
+                CROSS JOIN horizon h
+                CROSS JOIN generate_series(date_trunc('day', $1::timestamp), h.until, interval '1 day') AS d(day)
+                WHERE t.active
+                    AND extract(isodow FROM d.day) = t.weekday + 1
+                    AND d.day + t.start_time > GREATEST($1, t.materialized_until)
+                    AND d.day + t.start_time <= h.until
+            ), advanced AS (
+                UPDATE {self.__table} SET materialized_until = h.until
+                FROM horizon h
+                WHERE active AND (materialized_until IS NULL OR materialized_until < h.until)
+            ), created AS (
+                INSERT INTO {self.__events_table} (city, description, date, location, tempo, photo_id, photo_ids, template_id)
+                SELECT city, description, date, location, tempo, photo_id, photo_ids, id FROM slots
+                ON CONFLICT (template_id, date) DO NOTHING
+                RETURNING id
+            )
+            SELECT id, {change_notification(self.__events_table, "insert")} FROM created
+            """,
+            now,
+            weeks,
+        )
+        return len(data)
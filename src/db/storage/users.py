@@ -1,16 +1,21 @@
-from typing import List, Optional
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 
-from db.db import DB
+import asyncpg
 
+from db.db import DB, RELOAD, change_notification, reload_notification
+from kv import KV, dump_record, load_record
+from telemetry import trace_methods
 
-@dataclass
+
+@dataclass(slots=True)
 class User:
     ADMIN = "admin"
     USER = "user"
     BLOCKED = "blocked"
 
     locations = {"1": "Москва", "2": "Долгопрудный"}
+    columns = ("id", "name", "phone", "emergency_contact", "role", "location")
 
     id: int
     name: Optional[str] = None
@@ -22,57 +27,116 @@ class User:
     def __str__(self):
         return f"<a href='tg://user?id={self.id}'>{self.name}</a>\nPhone: {self.phone}\nEmergency Contact: {self.emergency_contact}"
 
+    @classmethod
+    def from_record(cls, record: asyncpg.Record) -> "User":
+        return cls(*record)
+
 
+@trace_methods
 class UsersStorage:
     __table = "users"
+    roles_channel = "user_roles"
+    export_columns = User.columns
+    __columns = ", ".join(User.columns)
+
+    __cache_prefix = "user:"
 
-    def __init__(self, db: DB):
+    def __init__(self, db: DB, kv: KV, cache_ttl: float = 300):
         self._db = db
+        self._kv = kv
+        self._cache_ttl = cache_ttl
 
     async def init(self):
-        await self._db.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.__table} (
-                id BIGINT PRIMARY KEY,
-                name TEXT,
-                phone TEXT,
-                emergency_contact TEXT,
-                role TEXT,
-                location TEXT
-            )
-        """
-        )
+        await self._db.subscribe(self.__table, self._on_change)
+
+    def _on_change(self, op: str, key: str):
+        if op == RELOAD or not key:
+            self._kv.discard_prefix(self.__cache_prefix)
+        else:
+            self._kv.discard(self._cache_key(int(key)))
+
+    def _cache_key(self, user_id: int) -> str:
+        return f"{self.__cache_prefix}{user_id}"
 
     async def get_by_id(self, user_id: int) -> User:
+        cached = await self._kv.get(self._cache_key(user_id))
+        if cached is not None:
+            return load_record(User, cached)
         data = await self._db.fetchrow(
-            f"SELECT * FROM {self.__table} WHERE id = $1", user_id
+            f"SELECT {self.__columns} FROM {self.__table} WHERE id = $1", user_id
         )
         if data is None:
             return None
-        return User(data[0], data[1], data[2], data[3], data[4], data[5])
+        user = User.from_record(data)
+        await self._kv.set(self._cache_key(user_id), dump_record(user), self._cache_ttl)
+        return user
+
+    async def get_many(self, user_ids: List[int]) -> Dict[int, User]:
+        cached = await self._kv.mget([self._cache_key(user_id) for user_id in user_ids])
+        users = {
+            user_id: load_record(User, value)
+            for user_id, value in zip(user_ids, cached)
+            if value is not None
+        }
+        missing = [user_id for user_id in user_ids if user_id not in users]
+        if missing:
+            data = await self._db.fetch(
+                f"SELECT {self.__columns} FROM {self.__table} WHERE id = ANY($1::bigint[])",
+                missing,
+            )
+            fetched = [User.from_record(row) for row in data]
+            await self._kv.mset(
+                {self._cache_key(user.id): dump_record(user) for user in fetched},
+                self._cache_ttl,
+            )
+            users.update((user.id, user) for user in fetched)
+        return users
 
     async def promote_to_admin(self, user_id: int):
-        await self._db.execute(
-            f"UPDATE {self.__table} SET role = $1 WHERE id = $2", User.ADMIN, user_id
-        )
+        await self._set_role(user_id, User.ADMIN)
 
     async def demote_from_admin(self, user_id: int):
+        await self._set_role(user_id, User.USER)
+
+    async def _set_role(self, user_id: int, role: str):
+        await self._kv.delete(self._cache_key(user_id))
         await self._db.execute(
-            f"UPDATE {self.__table} SET role = $1 WHERE id = $2", User.USER, user_id
+            f"""
+            WITH updated AS (
+                UPDATE {self.__table} SET role = $1 WHERE id = $2 RETURNING id, role
+            )
+            SELECT
+                pg_notify('{self.roles_channel}', id || ':' || role),
+                {change_notification(self.__table, "update")}
+            FROM updated
+        """,
+            role,
+            user_id,
         )
 
+    async def listen_roles(self, callback: Callable[[str], None]):
+        await self._db.listen(self.roles_channel, callback)
+
     async def get_role_list(self, role: str) -> List[int]:
         roles = await self._db.fetch(
-            f"SELECT * FROM {self.__table} WHERE role = $1", role
+            f"SELECT id FROM {self.__table} WHERE role = $1", role
         )
         if roles is None:
             return None
         return [role[0] for role in roles]
 
     async def create(self, user: User):
+        await self._kv.delete(self._cache_key(user.id))
         await self._db.execute(
             f"""
-            INSERT INTO {self.__table} (id, name, phone, emergency_contact, location, role) VALUES ($1, $2, $3, $4, $5, $6)
+            WITH created AS (
+                INSERT INTO {self.__table} (id, name, phone, emergency_contact, location, role) VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING id, role
+            )
+            SELECT
+                pg_notify('{self.roles_channel}', id || ':' || role),
+                {change_notification(self.__table, "insert")}
+            FROM created
         """,
             user.id,
             user.name,
@@ -83,9 +147,14 @@ class UsersStorage:
         )
 
     async def update(self, user: User):
+        await self._kv.delete(self._cache_key(user.id))
         await self._db.execute(
             f"""
-            UPDATE {self.__table} SET name = $1, phone = $2, emergency_contact = $3, location = $4 WHERE id = $5
+            WITH updated AS (
+                UPDATE {self.__table} SET name = $1, phone = $2, emergency_contact = $3, location = $4 WHERE id = $5
+                RETURNING id
+            )
+            SELECT {change_notification(self.__table, "update")} FROM updated
         """,
             user.name,
             user.phone,
@@ -97,40 +166,105 @@ class UsersStorage:
     async def get_all_members(self) -> List[User]:
         data = await self._db.fetch(
             f"""
-            SELECT * FROM {self.__table}
+            SELECT {self.__columns} FROM {self.__table}
         """
         )
         if data is None:
             return None
-        return [
-            User(
-                user_data[0],
-                user_data[1],
-                user_data[2],
-                user_data[3],
-                user_data[4],
-                user_data[5],
+        return [User.from_record(user_data) for user_data in data]
+
+    async def get_members_page(
+        self,
+        query: Optional[str] = None,
+        after: Optional[Tuple[str, int]] = None,
+        before: Optional[Tuple[str, int]] = None,
+        limit: int = 10,
+    ) -> Tuple[List[User], bool]:
+        conditions = []
+        params = []
+        if query:
+            params.append(query)
+            conditions.append(
+                f"(name ILIKE '%' || ${len(params)} || '%' OR phone ILIKE '%' || ${len(params)} || '%')"
+            )
+        cursor = after or before
+        if cursor:
+            params.extend(cursor)
+            conditions.append(
+                f"(COALESCE(name, ''), id) {'<' if before else '>'} (${len(params) - 1}, ${len(params)})"
             )
-            for user_data in data
-        ]
+        params.append(limit + 1)
+        order = "DESC" if before else "ASC"
+        data = await self._db.fetch(
+            f"""
+            SELECT {self.__columns} FROM {self.__table}
+            WHERE {" AND ".join(conditions) or "true"}
+            ORDER BY COALESCE(name, '') {order}, id {order}
+            LIMIT ${len(params)}
+            """,
+            *params,
+        )
+        users = [User.from_record(row) for row in data[:limit]]
+        if before:
+            users.reverse()
+        return users, len(data) > limit
+
+    async def iter_members(self, prefetch: int = 500) -> AsyncIterator[asyncpg.Record]:
+        async with self._db.transaction() as conn:
+            async for row in conn.cursor(
+                f"SELECT {self.__columns} FROM {self.__table} ORDER BY id",
+                prefetch=prefetch,
+            ):
+                yield row
+
+    async def import_members(self, records: Iterable[tuple]) -> int:
+        async with self._db.transaction() as conn:
+            await conn.execute(
+                f"CREATE TEMP TABLE {self.__table}_import (LIKE {self.__table}) ON COMMIT DROP"
+            )
+            await conn.copy_records_to_table(
+                f"{self.__table}_import", records=records, columns=self.export_columns
+            )
+            imported = await conn.fetchval(
+                f"""
+                WITH inserted AS (
+                    INSERT INTO {self.__table} ({self.__columns})
+                    SELECT {self.__columns} FROM {self.__table}_import
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM inserted
+            """
+            )
+            await conn.execute(
+                f"""
+                SELECT
+                    pg_notify('{self.roles_channel}', '{RELOAD}'),
+                    {reload_notification(self.__table)}
+            """
+            )
+            return imported
 
     async def get_user_amount(self) -> int:
         return await self._db.fetchval(f"SELECT COUNT(*) FROM {self.__table}")
 
     async def ban_user(self, user_id: User):
-        await self._db.execute(
-            f"UPDATE {self.__table} SET role = $1 WHERE id = $2", User.BLOCKED, user_id
-        )
+        await self._set_role(user_id, User.BLOCKED)
 
     async def unban_user(self, user_id: User):
-        await self._db.execute(
-            f"UPDATE {self.__table} SET role = $1 WHERE id = $2", User.USER, user_id
-        )
+        await self._set_role(user_id, User.USER)
 
     async def delete(self, user_id: int):
+        await self._kv.delete(self._cache_key(user_id))
         await self._db.execute(
             f"""
-            DELETE FROM {self.__table} WHERE id = $1
+            WITH deleted AS (
+                DELETE FROM {self.__table} WHERE id = $1 RETURNING id
+            )
+            SELECT
+                pg_notify('{self.roles_channel}', id || ':'),
+                {change_notification(self.__table, "delete")}
+            FROM deleted
         """,
             user_id,
         )
@@ -0,0 +1,10 @@
+from .cards import EventCards
+from .event_admin import EventAdminHandlers
+from .events import EventHandlers
+from .forms import FormHandlers
+from .members import MemberHandlers
+from .menu import MenuHandlers
+from .roster import RosterHandlers
+from .search import SearchHandlers
+from .templates import TemplateHandlers
+from .transfer import TransferHandlers
@@ -0,0 +1,215 @@
+import asyncio
+import functools
+import itertools
+import logging
+import typing
+from datetime import datetime, timedelta
+
+import aiogram
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputMediaPhoto
+
+from db.resilience import DatabaseUnavailable
+from db.storage import Event, EventMessage
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_MESSAGE_EDIT_WINDOW = timedelta(hours=48)
+EVENT_MESSAGE_EDIT_INTERVAL = 1 / 25
+EVENT_MESSAGE_CHAT_INTERVAL = 1
+PREVIEW_EVENT_MESSAGE_KINDS = (EventMessage.ADMIN, EventMessage.FEED)
+STALE_FILE_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file reference expired",
+)
+
+
+class EventCards:
+    def _event_card(
+        self,
+        event: Event,
+        kind: str,
+        user_id: int = None,
+        late: int = None,
+    ) -> typing.Tuple[str, typing.Optional[InlineKeyboardMarkup]]:
+        if kind == EventMessage.ADMIN:
+            return self._captions.render(event), self._create_admin_event_keyboard(
+                event.id
+            )
+        if kind == EventMessage.CREATED:
+            return (
+                self._captions.render(
+                    event,
+                    suffix=f"<a href='https://t.me/physhkabot?start={event.id}'>Записаться</a>",
+                ),
+                None,
+            )
+        prefix = "Запись на забег:\n\n" if kind == EventMessage.SIGNUP else ""
+        if late is None:
+            keyboard = InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [
+                        InlineKeyboardButton(
+                            text="Записаться",
+                            callback_data=f"register_{event.id}_{user_id}",
+                        )
+                    ]
+                ]
+            )
+        else:
+            keyboard = self._create_excuse_keyboard(event.id, user_id, late)
+        return self._captions.render(event, prefix=prefix), keyboard
+
+    async def _send_event_card(
+        self,
+        message: aiogram.types.Message,
+        event: Event,
+        kind: str,
+        user_id: int = None,
+        late: int = None,
+    ) -> aiogram.types.Message:
+        caption, keyboard = self._event_card(event, kind, user_id, late)
+        photos = event.photo_sizes(preview=kind in PREVIEW_EVENT_MESSAGE_KINDS)
+        for photo in photos[:-1]:
+            try:
+                return await message.answer_photo(
+                    photo, caption=caption, reply_markup=keyboard
+                )
+            except TelegramBadRequest as error:
+                if not self._is_stale_file_error(error):
+                    raise
+                await self._events_storage.drop_photo_size(event.id, photo)
+        return await message.answer_photo(
+            photos[-1], caption=caption, reply_markup=keyboard
+        )
+
+    def _is_stale_file_error(self, error: TelegramBadRequest) -> bool:
+        message = error.message.lower().replace("_", " ")
+        return any(stale in message for stale in STALE_FILE_ERRORS)
+
+    def _spawn_photo_prewarm(self, event: Event):
+        if self._cache_chat_id is None:
+            return
+        task = asyncio.create_task(self._prewarm_event_photo(event))
+        self._photo_prewarms.add(task)
+        task.add_done_callback(self._photo_prewarms.discard)
+
+    async def _prewarm_event_photo(self, event: Event):
+        for photo in dict.fromkeys(
+            (event.photo_sizes(preview=True)[0], event.photo_sizes()[0])
+        ):
+            try:
+                sent = await self._bot.send_photo(
+                    self._cache_chat_id, photo, disable_notification=True
+                )
+                await sent.delete()
+            except TelegramAPIError as error:
+                if isinstance(error, TelegramBadRequest) and self._is_stale_file_error(
+                    error
+                ):
+                    await self._events_storage.drop_photo_size(event.id, photo)
+                    continue
+                logger.warning(
+                    "Could not pre-warm event photo",
+                    extra={"event_id": event.id, "error": error.message},
+                )
+                return
+
+    def _propagate_event_update(self, event: Event, photo_changed: bool = False):
+        previous = self._event_fanouts.pop(event.id, None)
+        if previous is not None:
+            previous.cancel()
+        task = asyncio.create_task(self._update_sent_event_cards(event, photo_changed))
+        self._event_fanouts[event.id] = task
+        task.add_done_callback(functools.partial(self._forget_event_fanout, event.id))
+
+    def _forget_event_fanout(self, event_id: int, task: asyncio.Task):
+        if self._event_fanouts.get(event_id) is task:
+            del self._event_fanouts[event_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Failed to update sent event cards",
+                exc_info=task.exception(),
+                extra={"event_id": event_id},
+            )
+
+    async def _update_sent_event_cards(self, event: Event, photo_changed: bool):
+        messages = await self._events_storage.messages.get_sent_since(
+            event.id, datetime.now() - EVENT_MESSAGE_EDIT_WINDOW
+        )
+        lates = await self._events_storage.registrations.get_event_lates(event.id)
+        for chat_id, chat_messages in itertools.groupby(
+            messages, key=lambda sent: sent.chat_id
+        ):
+            for index, sent in enumerate(chat_messages):
+                if index:
+                    await asyncio.sleep(EVENT_MESSAGE_CHAT_INTERVAL)
+                caption, keyboard = self._event_card(
+                    event, sent.kind, chat_id, lates.get(chat_id)
+                )
+                try:
+                    await self._edit_event_card(
+                        sent, event, caption, keyboard, photo_changed
+                    )
+                except (DatabaseUnavailable, TelegramAPIError) as error:
+                    logger.warning(
+                        "Could not update sent event card",
+                        extra={
+                            "event_id": event.id,
+                            "chat_id": sent.chat_id,
+                            "message_id": sent.message_id,
+                            "error": repr(error),
+                        },
+                    )
+            await asyncio.sleep(EVENT_MESSAGE_EDIT_INTERVAL)
+
+    async def _edit_event_card(
+        self,
+        sent: EventMessage,
+        event: Event,
+        caption: str,
+        keyboard: typing.Optional[InlineKeyboardMarkup],
+        photo_changed: bool,
+    ):
+        for _ in range(2):
+            try:
+                if photo_changed:
+                    await self._bot.edit_message_media(
+                        chat_id=sent.chat_id,
+                        message_id=sent.message_id,
+                        media=InputMediaPhoto(
+                            media=event.photo_sizes(
+                                preview=sent.kind in PREVIEW_EVENT_MESSAGE_KINDS
+                            )[0],
+                            caption=caption,
+                        ),
+                        reply_markup=keyboard,
+                    )
+                else:
+                    await self._bot.edit_message_caption(
+                        chat_id=sent.chat_id,
+                        message_id=sent.message_id,
+                        caption=caption,
+                        reply_markup=keyboard,
+                    )
+                return
+            except TelegramRetryAfter as error:
+                await asyncio.sleep(error.retry_after)
+            except TelegramBadRequest as error:
+                if "not modified" not in error.message:
+                    await self._events_storage.messages.forget(
+                        sent.chat_id, sent.message_id
+                    )
+                return
+            except TelegramForbiddenError:
+                await self._events_storage.messages.forget(
+                    sent.chat_id, sent.message_id
+                )
+                return
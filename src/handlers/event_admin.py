@@ -0,0 +1,327 @@
+import functools
+import typing
+from datetime import datetime
+
+import aiogram
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from db.storage import User, Event, EventMessage
+from handlers.states import GetEventData, ConfirmDeletingEvent, EditEventData
+
+
+class EventAdminHandlers:
+    async def _create_event(self, callback: aiogram.types.CallbackQuery):
+        city_keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text="Москва", callback_data="set_event_city_1")],
+                [
+                    InlineKeyboardButton(
+                        text="Долгопрудный", callback_data="set_event_city_2"
+                    )
+                ],
+            ]
+        )
+        await callback.message.answer("Выберите город:", reply_markup=city_keyboard)
+
+    async def _get_event_city(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        await callback.message.edit_reply_markup()
+        await state.update_data(city=callback.data.split("_")[-1])
+        await callback.message.answer(
+            "Отправьте фото для забега:", reply_markup=self._cancel_keyboard
+        )
+        await state.set_state(GetEventData.photo)
+
+    async def _get_event_photo(self, message: aiogram.types.Message, state: FSMContext):
+        if not message.photo:
+            await message.answer(
+                "Пожалуйста, отправьте фото для забега.",
+                reply_markup=self._cancel_keyboard,
+            )
+            return
+
+        await state.update_data(
+            event_photo_ids=[photo.file_id for photo in message.photo]
+        )
+
+        await message.answer(
+            "Фото сохранено. Теперь введите описание забега:",
+            reply_markup=self._cancel_keyboard,
+        )
+        await state.set_state(GetEventData.description)
+
+    async def _get_event_description(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        await state.update_data(description=message.text.strip())
+        await message.answer("Введите дату забега:", reply_markup=self._cancel_keyboard)
+        await state.set_state(GetEventData.date)
+
+    async def _get_event_date(self, message: aiogram.types.Message, state: FSMContext):
+        if self._parse_event_date(message.text) is None:
+            await message.answer(
+                "Пожалуйста, введите дату в формате ДД.ММ в ЧЧ:ММ",
+                reply_markup=self._cancel_keyboard,
+            )
+            return
+        await state.update_data(date=message.text.strip())
+        await message.answer(
+            "Введите место проведения забега:", reply_markup=self._cancel_keyboard
+        )
+        await state.set_state(GetEventData.location)
+
+    async def _get_event_location(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        await state.update_data(location=message.text.strip())
+        await message.answer("Введите темп забега:", reply_markup=self._cancel_keyboard)
+        await state.set_state(GetEventData.tempo)
+
+    async def _get_event_tempo(self, message: aiogram.types.Message, state: FSMContext):
+        await state.update_data(tempo=message.text.strip())
+        event_data = await state.get_data()
+        event = Event(
+            city=event_data["city"],
+            description=event_data["description"],
+            date=self._parse_event_date(event_data["date"]),
+            location=event_data["location"],
+            tempo=event_data["tempo"],
+            photo_id=event_data["event_photo_ids"][-1],
+            photo_ids=event_data["event_photo_ids"],
+        )
+
+        event_id = await self._events_storage.create(event)
+        event.id = event_id
+        await state.clear()
+        self._spawn_photo_prewarm(event)
+
+        sent = await self._send_event_card(message, event, EventMessage.CREATED)
+        await self._events_storage.messages.record(
+            [(event.id, sent.chat.id, sent.message_id, EventMessage.CREATED)]
+        )
+        await message.answer(
+            f"Забег успешно создан. Ссылка для регистрации:\n\n<code>https://t.me/physhkabot?start={event_id}</code>"
+        )
+
+    def _create_admin_event_keyboard(self, event_id: int) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="Посмотреть участников",
+                        callback_data=f"event_users_{event_id}",
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="Изменить забег",
+                        callback_data=f"edit_event_{event_id}",
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="Удалить забег",
+                        callback_data=f"delete_event_{event_id}",
+                    )
+                ],
+            ]
+        )
+
+    async def _confirm_deleting_event(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        event_id = int(callback.data.split("_")[2])
+        await state.set_state(ConfirmDeletingEvent.confirmation)
+        await state.update_data(event_id=event_id)
+        await callback.message.answer(
+            f"Вы уверены, что хотите удалить забег {event_id}?",
+            reply_markup=self._cancel_keyboard,
+        )
+
+    async def _delete_event(self, message: aiogram.types.Message, state: FSMContext):
+        if message.text.lower() == "да":
+            event_id = (await state.get_data())["event_id"]
+            await self._events_storage.delete(event_id)
+            await message.answer("Забег удален")
+        else:
+            await message.answer("Действие отменено")
+        await state.clear()
+
+    async def _edit_event(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        event_id = int(callback.data.split("_")[2])
+        event = await self._events_storage.get_by_id(event_id)
+        if event is None:
+            await callback.answer("Забег не найден")
+            return
+        await state.set_state(None)
+        await state.update_data(event_id=event.id, version=event.version)
+        await callback.message.answer(
+            "Что изменить?", reply_markup=self._edit_event_keyboard
+        )
+
+    async def _choose_event_field(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        field = callback.data.removeprefix("edit_field_")
+        if field == "city":
+            await callback.message.answer(
+                "Выберите город:",
+                reply_markup=InlineKeyboardMarkup(
+                    inline_keyboard=[
+                        [
+                            InlineKeyboardButton(
+                                text=text, callback_data=f"edit_city_{location}"
+                            )
+                        ]
+                        for location, text in User.locations.items()
+                    ]
+                    + self._cancel_keyboard.inline_keyboard
+                ),
+            )
+            return
+        prompts = {
+            "photo": (EditEventData.photo, "Отправьте новое фото для забега:"),
+            "description": (EditEventData.description, "Введите новое описание:"),
+            "date": (EditEventData.date, "Введите новую дату в формате ДД.ММ в ЧЧ:ММ"),
+            "location": (EditEventData.location, "Введите новое место проведения:"),
+            "tempo": (EditEventData.tempo, "Введите новый темп:"),
+        }
+        new_state, prompt = prompts[field]
+        await state.set_state(new_state)
+        await callback.message.answer(prompt, reply_markup=self._cancel_keyboard)
+
+    async def _edit_event_city(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        await callback.message.edit_reply_markup()
+        await self._save_event_edit(
+            callback.message, state, city=callback.data.split("_")[-1]
+        )
+
+    async def _edit_event_photo(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        if not message.photo:
+            await message.answer(
+                "Пожалуйста, отправьте фото для забега.",
+                reply_markup=self._cancel_keyboard,
+            )
+            return
+        await self._save_event_edit(
+            message,
+            state,
+            photo_id=message.photo[-1].file_id,
+            photo_ids=[photo.file_id for photo in message.photo],
+        )
+
+    async def _edit_event_description(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        await self._save_event_edit(message, state, description=message.text.strip())
+
+    async def _edit_event_date(self, message: aiogram.types.Message, state: FSMContext):
+        date = self._parse_event_date(message.text)
+        if date is None:
+            await message.answer(
+                "Пожалуйста, введите дату в формате ДД.ММ в ЧЧ:ММ",
+                reply_markup=self._cancel_keyboard,
+            )
+            return
+        await self._save_event_edit(message, state, date=date)
+
+    async def _edit_event_location(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        await self._save_event_edit(message, state, location=message.text.strip())
+
+    async def _edit_event_tempo(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        await self._save_event_edit(message, state, tempo=message.text.strip())
+
+    async def _save_event_edit(
+        self, message: aiogram.types.Message, state: FSMContext, **fields
+    ):
+        event_data = await state.get_data()
+        await state.clear()
+        if "version" not in event_data:
+            await message.answer(
+                "Откройте забег заново", reply_markup=self._menu_keyboard_admin
+            )
+            return
+        event = await self._events_storage.update_fields(
+            event_data["event_id"], event_data["version"], **fields
+        )
+        if event is None:
+            await message.answer(
+                "Забег был изменён другим администратором или удалён. "
+                "Откройте его заново и повторите изменение.",
+                reply_markup=self._menu_keyboard_admin,
+            )
+            return
+        await message.answer_photo(
+            event.photo_id,
+            caption=self._captions.render(event),
+            reply_markup=self._menu_keyboard_admin,
+        )
+        if "photo_id" in fields:
+            self._spawn_photo_prewarm(event)
+        self._propagate_event_update(event, photo_changed="photo_id" in fields)
+
+    def _parse_event_date(self, text: str) -> typing.Optional[datetime]:
+        try:
+            date = datetime.strptime(text.strip(), "%d.%m в %H:%M")
+        except ValueError:
+            return None
+        return date.replace(year=datetime.now().year)
+
+    @functools.cached_property
+    def _edit_event_keyboard(self) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(text="Город", callback_data="edit_field_city"),
+                    InlineKeyboardButton(text="Фото", callback_data="edit_field_photo"),
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="Описание", callback_data="edit_field_description"
+                    ),
+                    InlineKeyboardButton(text="Дата", callback_data="edit_field_date"),
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="Место", callback_data="edit_field_location"
+                    ),
+                    InlineKeyboardButton(text="Темп", callback_data="edit_field_tempo"),
+                ],
+                [InlineKeyboardButton(text="Отменить", callback_data="cancel")],
+            ]
+        )
+
+    def _event_admin_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="event_admin")
+        router.callback_query.filter(self._admin_only)
+        router.callback_query.register(
+            self._create_event, aiogram.F.data == "create_event"
+        )
+        router.callback_query.register(
+            self._get_event_city, aiogram.F.data.startswith("set_event_city_")
+        )
+        router.callback_query.register(
+            self._confirm_deleting_event, aiogram.F.data.startswith("delete_event_")
+        )
+        router.callback_query.register(
+            self._edit_event, aiogram.F.data.startswith("edit_event_")
+        )
+        router.callback_query.register(
+            self._choose_event_field, aiogram.F.data.startswith("edit_field_")
+        )
+        router.callback_query.register(
+            self._edit_event_city, aiogram.F.data.startswith("edit_city_")
+        )
+        return router
@@ -0,0 +1,259 @@
+import aiogram
+from aiogram.fsm.context import FSMContext
+from aiogram.types import (
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+    InlineQueryResultCachedPhoto,
+)
+
+from db.storage import EventMessage
+from handlers.states import GetUserData
+
+
+INLINE_CACHE_TIME = 300
+
+
+class EventHandlers:
+    async def _show_events(self, callback: aiogram.types.CallbackQuery):
+        if not self._access.is_admin(callback.from_user.id):
+            user = await self._users_storage.get_by_id(callback.from_user.id)
+            events = await self._events_storage.get_all_events(
+                city=user.location, actual_only=True
+            )
+            if len(events) == 0:
+                await callback.message.answer("На данный момент нет активных забегов")
+            else:
+                sent_cards = []
+                for event in events:
+                    registration = (
+                        await self._events_storage.registrations.is_registered(
+                            callback.from_user.id, event.id
+                        )
+                    )
+                    sent = await self._send_event_card(
+                        callback.message,
+                        event,
+                        EventMessage.FEED,
+                        callback.from_user.id,
+                        registration.late if registration else None,
+                    )
+                    sent_cards.append(
+                        (event.id, sent.chat.id, sent.message_id, EventMessage.FEED)
+                    )
+                await self._events_storage.messages.record(sent_cards)
+        else:
+            events = await self._events_storage.get_all_events()
+            sent_cards = []
+            for event in events:
+                sent = await self._send_event_card(
+                    callback.message, event, EventMessage.ADMIN
+                )
+                sent_cards.append(
+                    (event.id, sent.chat.id, sent.message_id, EventMessage.ADMIN)
+                )
+            await self._events_storage.messages.record(sent_cards)
+
+    async def _register_user(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        event_id = int(callback.data.split("_")[1])
+        user_id = int(callback.data.split("_")[2])
+        user = await self._users_storage.get_by_id(user_id)
+        event = await self._events_storage.get_by_id(event_id)
+        if event is not None and user is not None:
+            if user.name is not None:
+                if await self._events_storage.is_user_registered(user_id, event_id):
+                    await callback.message.edit_reply_markup()
+                    await callback.answer("Вы уже записаны на этот забег")
+                else:
+                    await self._events_storage.register_user(user_id, event_id)
+                    await callback.answer("Вы успешно записались на забег")
+            else:
+                await self._bot.send_message(
+                    user_id,
+                    "Необходимо пройти регистрацию. Введите ваше Имя и Фамилию:",
+                )
+                await state.set_state(GetUserData.name)
+                await state.update_data(event_id=event_id)
+        else:
+            await callback.answer("Забег не найден")
+
+    async def _show_my_events(self, callback: aiogram.types.CallbackQuery):
+        user_id = callback.from_user.id
+        events = await self._events_storage.get_user_events(user_id, actual_only=True)
+        if len(events) == 0:
+            await callback.message.answer("Вы не записаны ни на один забег")
+        else:
+            await callback.message.answer("Ваши регистрации:")
+            sent_cards = []
+            for event in events:
+                registration = (
+                    await self._events_storage.registrations.get_registration(
+                        user_id, event.id
+                    )
+                )
+                sent = await self._send_event_card(
+                    callback.message,
+                    event,
+                    EventMessage.FEED,
+                    user_id,
+                    registration.late,
+                )
+                sent_cards.append(
+                    (event.id, sent.chat.id, sent.message_id, EventMessage.FEED)
+                )
+            await self._events_storage.messages.record(sent_cards)
+
+    async def _inline_events(self, inline_query: aiogram.types.InlineQuery):
+        results = [
+            InlineQueryResultCachedPhoto(
+                id=str(event.id),
+                photo_file_id=event.photo_sizes(preview=True)[0],
+                caption=self._captions.render(event),
+                reply_markup=InlineKeyboardMarkup(
+                    inline_keyboard=[
+                        [
+                            InlineKeyboardButton(
+                                text="Записаться",
+                                url=f"https://t.me/physhkabot?start={event.id}",
+                            )
+                        ]
+                    ]
+                ),
+            )
+            for event in self._upcoming_events.search(inline_query.query)
+        ]
+        await inline_query.answer(
+            results, cache_time=INLINE_CACHE_TIME, is_personal=False
+        )
+
+    async def _ask_change_late(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        event_id = int(callback.data.split("_")[-2])
+        user_id = int(callback.data.split("_")[-1])
+        late_keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="5 минут", callback_data=f"late_{event_id}_{user_id}_5"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="10 минут", callback_data=f"late_{event_id}_{user_id}_10"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="15 минут", callback_data=f"late_{event_id}_{user_id}_15"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="Отписаться",
+                        callback_data=f"late_{event_id}_{user_id}_-1",
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="Назад",
+                        callback_data=f"set_classic_late_keyboard_{event_id}_{user_id}",
+                    )
+                ],
+            ]
+        )
+        await self._bot.edit_message_reply_markup(
+            chat_id=callback.message.chat.id,
+            message_id=callback.message.message_id,
+            reply_markup=late_keyboard,
+        )
+
+    def _create_excuse_keyboard(self, event_id: int, user_id: int, late: int):
+        if late == -1:
+            return InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [
+                        InlineKeyboardButton(
+                            text="Я всё-таки приду",
+                            callback_data=f"late_{event_id}_{user_id}_0",
+                        )
+                    ]
+                ]
+            )
+        elif late == 0:
+            return InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [
+                        InlineKeyboardButton(
+                            text="Я не приду/опоздаю",
+                            callback_data=f"change_late_{event_id}_{user_id}",
+                        )
+                    ]
+                ]
+            )
+        else:
+            return InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [
+                        InlineKeyboardButton(
+                            text="Я буду вовремя",
+                            callback_data=f"late_{event_id}_{user_id}_0",
+                        )
+                    ]
+                ]
+            )
+
+    async def _set_late(self, callback: aiogram.types.CallbackQuery):
+        event_id = int(callback.data.split("_")[1])
+        user_id = int(callback.data.split("_")[2])
+        late_minutes = int(callback.data.split("_")[3])
+        await self._events_storage.registrations.set_late(
+            user_id, event_id, late_minutes
+        )
+        await self._bot.edit_message_reply_markup(
+            chat_id=callback.message.chat.id,
+            message_id=callback.message.message_id,
+            reply_markup=self._create_excuse_keyboard(event_id, user_id, late_minutes),
+        )
+
+    async def _set_classic_late_keyboard(self, callback: aiogram.types.CallbackQuery):
+        event_id = int(callback.data.split("_")[-2])
+        user_id = int(callback.data.split("_")[-1])
+        late_cancel_keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="Я не приду/опоздаю",
+                        callback_data=f"change_late_{event_id}_{user_id}",
+                    )
+                ]
+            ]
+        )
+        await self._bot.edit_message_reply_markup(
+            chat_id=callback.message.chat.id,
+            message_id=callback.message.message_id,
+            reply_markup=late_cancel_keyboard,
+        )
+
+    def _events_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="events")
+        router.inline_query.register(self._inline_events)
+        router.callback_query.register(self._show_events, aiogram.F.data == "events")
+        router.callback_query.register(
+            self._register_user, aiogram.F.data.startswith("register_")
+        )
+        router.callback_query.register(
+            self._show_my_events, aiogram.F.data.startswith("my_registrations")
+        )
+        router.callback_query.register(
+            self._ask_change_late, aiogram.F.data.startswith("change_late_")
+        )
+        router.callback_query.register(
+            self._set_classic_late_keyboard,
+            aiogram.F.data.startswith("set_classic_late_keyboard_"),
+        )
+        router.callback_query.register(
+            self._set_late, aiogram.F.data.startswith("late_")
+        )
+        return router
@@ -0,0 +1,30 @@
+import aiogram
+
+from handlers.states import (
+    GetUserData,
+    GetEventData,
+    ConfirmDeletingEvent,
+    EditEventData,
+)
+
+
+class FormHandlers:
+    def _forms_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="forms")
+        router.message.register(self._delete_event, ConfirmDeletingEvent.confirmation)
+        router.message.register(self._edit_event_photo, EditEventData.photo)
+        router.message.register(self._edit_event_description, EditEventData.description)
+        router.message.register(self._edit_event_date, EditEventData.date)
+        router.message.register(self._edit_event_location, EditEventData.location)
+        router.message.register(self._edit_event_tempo, EditEventData.tempo)
+        router.message.register(self._get_event_photo, GetEventData.photo)
+        router.message.register(self._get_event_description, GetEventData.description)
+        router.message.register(self._get_event_date, GetEventData.date)
+        router.message.register(self._get_event_location, GetEventData.location)
+        router.message.register(self._get_event_tempo, GetEventData.tempo)
+        router.message.register(self._get_user_name, GetUserData.name)
+        router.message.register(self._get_user_phone, GetUserData.phone)
+        router.message.register(
+            self._get_user_emergency_contact, GetUserData.emergency_contact
+        )
+        return router
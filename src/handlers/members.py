@@ -0,0 +1,205 @@
+import html
+import typing
+from datetime import datetime, timedelta
+
+import aiogram
+from aiogram.filters.command import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from db.storage import User
+
+
+MEMBERS_PAGE_SIZE = 10
+
+
+class MemberHandlers:
+    async def _show_dashboard(self, callback: aiogram.types.CallbackQuery):
+        dashboard = await self._events_storage.dashboard.get()
+        cities: typing.Dict[str, typing.Dict[str, int]] = {}
+        for row in dashboard.members:
+            roles = cities.setdefault(row["city"], {})
+            roles[row["role"]] = roles.get(row["role"], 0) + row["amount"]
+        total = sum(sum(roles.values()) for roles in cities.values())
+        message = f"📈 Участников: {total}\n"
+        for city, roles in cities.items():
+            message += (
+                f"{User.locations.get(city, city or 'Без города')}: "
+                f"{sum(roles.values())} (админов {roles.get(User.ADMIN, 0)}, "
+                f"заблокировано {roles.get(User.BLOCKED, 0)})\n"
+            )
+        signups = {row["week"]: row["amount"] for row in dashboard.growth}
+        this_week = datetime.now().date() - timedelta(days=datetime.now().weekday())
+        message += "\nНовые участники по неделям:\n"
+        for weeks_ago in range(7, -1, -1):
+            week = this_week - timedelta(weeks=weeks_ago)
+            message += f"{week.strftime('%d.%m')}: {signups.get(week.isoformat(), 0)}\n"
+        message += "\nБлижайшие забеги:\n"
+        if not dashboard.upcoming:
+            message += "нет\n"
+        for row in dashboard.upcoming:
+            date = datetime.fromisoformat(row["date"])
+            message += (
+                f"#{row['id']} {date.strftime('%d.%m %H:%M')}, "
+                f"{User.locations.get(row['city'], row['city'])}, "
+                f"{html.escape(row['location'] or '')}: записались {row['signups']}\n"
+            )
+        await callback.message.answer(
+            message,
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [
+                        InlineKeyboardButton(
+                            text="👥 Список участников", callback_data="members_page"
+                        )
+                    ]
+                ]
+            ),
+        )
+
+    async def _render_members_page(
+        self, directory: dict
+    ) -> typing.Tuple[str, InlineKeyboardMarkup]:
+        users, more = await self._users_storage.get_members_page(
+            query=directory["query"],
+            after=directory["after"] and tuple(directory["after"]),
+            before=directory["before"] and tuple(directory["before"]),
+            limit=MEMBERS_PAGE_SIZE,
+        )
+        if directory["before"]:
+            has_prev, has_next = more, True
+        else:
+            has_prev, has_next = directory["after"] is not None, more
+        text = "👥 Участники"
+        if directory["query"]:
+            text += f" по запросу «{html.escape(directory['query'])}»"
+        if not users:
+            text += "\n\nНикого не найдено"
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text=f"{user.name or user.id} · {user.phone or '—'}"
+                    + {User.ADMIN: " 👑", User.BLOCKED: " 🚫"}.get(user.role, ""),
+                    callback_data=f"member_{user.id}",
+                )
+            ]
+            for user in users
+        ]
+        navigation = []
+        if users and has_prev:
+            navigation.append(
+                InlineKeyboardButton(text="⬅️", callback_data="members_prev")
+            )
+        if users and has_next:
+            navigation.append(
+                InlineKeyboardButton(text="➡️", callback_data="members_next")
+            )
+        if navigation:
+            buttons.append(navigation)
+        if users:
+            directory["first"] = [users[0].name or "", users[0].id]
+            directory["last"] = [users[-1].name or "", users[-1].id]
+        return text, InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    async def _search_members(self, message: aiogram.types.Message, state: FSMContext):
+        query = message.text.partition(" ")[2].strip() or None
+        directory = {"query": query, "after": None, "before": None}
+        text, keyboard = await self._render_members_page(directory)
+        await state.update_data(directory=directory)
+        await message.answer(text, reply_markup=keyboard)
+
+    async def _show_members_page(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        directory = (await state.get_data()).get("directory")
+        if directory is None or callback.data == "members_page":
+            directory = {"query": None, "after": None, "before": None}
+        elif callback.data == "members_next":
+            directory.update(after=directory["last"], before=None)
+        elif callback.data == "members_prev":
+            directory.update(after=None, before=directory["first"])
+        text, keyboard = await self._render_members_page(directory)
+        await state.update_data(directory=directory)
+        if callback.data == "members_page":
+            await callback.message.answer(text, reply_markup=keyboard)
+        else:
+            await callback.message.edit_text(text, reply_markup=keyboard)
+
+    def _member_card(self, user: User) -> typing.Tuple[str, InlineKeyboardMarkup]:
+        actions = []
+        if user.role == User.ADMIN:
+            actions.append(("Снять админа", "user"))
+        elif user.role == User.BLOCKED:
+            actions.append(("Разблокировать", "unban"))
+        else:
+            actions.append(("Сделать админом", "admin"))
+            actions.append(("Заблокировать", "ban"))
+        buttons = [
+            [
+                InlineKeyboardButton(
+                    text=text, callback_data=f"member_role_{user.id}_{action}"
+                )
+            ]
+            for text, action in actions
+        ]
+        buttons.append(
+            [InlineKeyboardButton(text="⬅️ К списку", callback_data="members_back")]
+        )
+        roles = {
+            User.ADMIN: "админ",
+            User.BLOCKED: "заблокирован",
+            User.USER: "участник",
+        }
+        return (
+            f"{user}\nГород: {User.locations.get(user.location, user.location)}"
+            f"\nРоль: {roles.get(user.role, user.role)}",
+            InlineKeyboardMarkup(inline_keyboard=buttons),
+        )
+
+    async def _show_member(self, callback: aiogram.types.CallbackQuery):
+        user = await self._users_storage.get_by_id(int(callback.data.split("_")[1]))
+        if user is None:
+            await callback.answer("Пользователь не найден")
+            return
+        text, keyboard = self._member_card(user)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+
+    async def _change_member_role(self, callback: aiogram.types.CallbackQuery):
+        _, _, user_id, action = callback.data.split("_")
+        user_id = int(user_id)
+        if user_id == callback.from_user.id:
+            await callback.answer("Нельзя менять собственную роль", show_alert=True)
+            return
+        change = {
+            "admin": self._users_storage.promote_to_admin,
+            "user": self._users_storage.demote_from_admin,
+            "ban": self._users_storage.ban_user,
+            "unban": self._users_storage.unban_user,
+        }[action]
+        await change(user_id)
+        user = await self._users_storage.get_by_id(user_id)
+        if user is None:
+            await callback.answer("Пользователь не найден")
+            return
+        text, keyboard = self._member_card(user)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+
+    def _members_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="members")
+        router.message.filter(self._admin_only)
+        router.callback_query.filter(self._admin_only)
+        router.message.register(self._search_members, Command(commands=["members"]))
+        router.callback_query.register(self._show_dashboard, aiogram.F.data == "users")
+        router.callback_query.register(
+            self._show_members_page,
+            aiogram.F.data.in_(
+                {"members_page", "members_next", "members_prev", "members_back"}
+            ),
+        )
+        router.callback_query.register(
+            self._change_member_role, aiogram.F.data.startswith("member_role_")
+        )
+        router.callback_query.register(
+            self._show_member, aiogram.F.data.startswith("member_")
+        )
+        return router
@@ -0,0 +1,203 @@
+import typing
+
+import aiogram
+from aiogram.filters.command import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from db.storage import User, EventMessage, Stats
+from handlers.states import GetUserData
+
+
+class MenuHandlers:
+    async def _show_menu(self, message: aiogram.types.Message, user: User):
+        splitted_message_text = message.text.split()
+
+        if len(splitted_message_text) == 2:
+            event_id = int(splitted_message_text[1])
+            event = await self._events_storage.get_by_id(event_id)
+            if event is not None:
+                kind = (
+                    EventMessage.ADMIN
+                    if user.role == User.ADMIN
+                    else EventMessage.SIGNUP
+                )
+                sent = await self._send_event_card(message, event, kind, user.id)
+                await self._events_storage.messages.record(
+                    [(event.id, sent.chat.id, sent.message_id, kind)]
+                )
+            else:
+                await message.answer(
+                    "Забег не найден", reply_markup=self._menu_keyboard_user
+                )
+        elif user.role == User.ADMIN:
+            await message.answer(
+                "Добро пожаловать в админ панель",
+                reply_markup=self._menu_keyboard_admin,
+            )
+        else:
+            await message.answer(
+                "Добро пожаловать в телеграм бота бегового клуба Physhka",
+                reply_markup=self._menu_keyboard_user,
+            )
+
+    def _user_middleware(self, func: typing.Callable) -> typing.Callable:
+        async def wrapper(message: aiogram.types.Message, *args, **kwargs):
+            user = await self._users_storage.get_by_id(message.chat.id)
+            if user is None:
+                user = User(
+                    id=message.chat.id,
+                    role=self._access.role_for_new_user(message.chat.id),
+                )
+                await self._users_storage.create(user)
+
+            await func(message, user)
+
+        return wrapper
+
+    def _admin_required(self, func: typing.Callable) -> typing.Callable:
+        async def wrapper(message: aiogram.types.Message, user: User, *args, **kwargs):
+            if user.role == User.ADMIN:
+                await func(message, user)
+
+        return wrapper
+
+    async def _get_user_name(self, message: aiogram.types.Message, state: FSMContext):
+        await state.update_data(name=message.text.strip())
+        await message.answer("Введите ваш номер телефона:")
+        await state.set_state(GetUserData.phone)
+
+    async def _get_user_phone(self, message: aiogram.types.Message, state: FSMContext):
+        await state.update_data(phone=message.text.strip())
+        await message.answer("Введите телефон экстренного контакта и его имя:")
+        await state.set_state(GetUserData.emergency_contact)
+
+    async def _get_user_emergency_contact(
+        self, message: aiogram.types.Message, state: FSMContext
+    ):
+        user_data = await state.get_data()
+        user = User(
+            id=message.chat.id,
+            name=user_data["name"],
+            phone=user_data["phone"],
+            emergency_contact=message.text.strip(),
+        )
+        await self._users_storage.update(user)
+        await self._events_storage.register_user(user.id, user_data["event_id"])
+        await state.clear()
+        await message.answer(
+            "Вы успешно зарегистрировались на забег",
+            reply_markup=self._menu_keyboard_user,
+        )
+
+    def _build_location_keyboard(self, user_location: str):
+        moscow_text = "Москва"
+        dolgoprudny_text = "Долгопрудный"
+        all_text = "Все локации"
+        if user_location == "12":
+            all_text = "✅ Все локации"
+        elif user_location == "1":
+            moscow_text = "✅ Москва"
+        elif user_location == "2":
+            dolgoprudny_text = "✅ Долгопрудный"
+
+        location_keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text=moscow_text, callback_data="change_location_1"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text=dolgoprudny_text, callback_data="change_location_2"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text=all_text, callback_data="change_location_12"
+                    )
+                ],
+            ]
+        )
+        return location_keyboard
+
+    async def _change_location(self, callback: aiogram.types.CallbackQuery):
+        user = await self._users_storage.get_by_id(callback.from_user.id)
+        await callback.message.answer(
+            "Выберите город:", reply_markup=self._build_location_keyboard(user.location)
+        )
+
+    async def _change_location_choice(self, callback: aiogram.types.CallbackQuery):
+        location = callback.data.split("_")[-1]
+        user = await self._users_storage.get_by_id(callback.from_user.id)
+        user.location = location
+        await self._users_storage.update(user)
+        await callback.message.edit_reply_markup(
+            reply_markup=self._build_location_keyboard(location)
+        )
+
+    def _format_stats(self, stats: Stats) -> str:
+        return (
+            f"Записей: {stats.registered}\n"
+            f"Пришёл: {stats.attended}\n"
+            f"Отмен: {stats.cancelled} ({stats.cancel_rate:.0%})\n"
+            f"Опозданий: {stats.late}, в среднем {stats.average_lateness:.0f} мин"
+        )
+
+    async def _show_stats(self, callback: aiogram.types.CallbackQuery):
+        if not self._access.is_admin(callback.from_user.id):
+            stats = await self._events_storage.stats.get_user_stats(
+                callback.from_user.id
+            )
+            await callback.message.answer(
+                "📊 Ваша статистика\n\n" + self._format_stats(stats)
+            )
+            return
+        events = await self._events_storage.get_all_events(actual_only=True)
+        if not events:
+            await callback.message.answer("На данный момент нет активных забегов")
+            return
+        stats = {
+            item.key: item
+            for item in await self._events_storage.stats.get_events_stats(
+                [event.id for event in events]
+            )
+        }
+        message = "📊 Статистика забегов\n\n"
+        for event in events:
+            message += f"<b>{event.date.strftime('%d.%m %H:%M')} {event.location}</b>\n"
+            if event.id in stats:
+                message += self._format_stats(stats[event.id]) + "\n\n"
+            else:
+                message += "Никто не записан\n\n"
+        await callback.message.answer(message)
+
+    async def _cancel(self, callback: aiogram.types.CallbackQuery, state: FSMContext):
+        await state.clear()
+        if self._access.is_admin(callback.from_user.id):
+            await callback.message.answer(
+                "Действие отменено", reply_markup=self._menu_keyboard_admin
+            )
+        else:
+            await callback.message.answer(
+                "Действие отменено", reply_markup=self._menu_keyboard_user
+            )
+
+    def _menu_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="menu")
+        router.message.register(
+            self._user_middleware(self._show_menu), Command(commands=["start", "menu"])
+        )
+        router.message.register(
+            self._user_middleware(self._show_menu), aiogram.F.text == "Menu"
+        )
+        router.callback_query.register(
+            self._change_location, aiogram.F.data == "change_location"
+        )
+        router.callback_query.register(
+            self._change_location_choice, aiogram.F.data.startswith("change_location_")
+        )
+        router.callback_query.register(self._show_stats, aiogram.F.data == "stats")
+        router.callback_query.register(self._cancel, aiogram.F.data == "cancel")
+        return router
@@ -0,0 +1,124 @@
+import asyncio
+import time
+import typing
+
+import aiogram
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from db.db import RELOAD
+
+
+LIVE_ROSTER_EDIT_INTERVAL = 3
+LIVE_ROSTER_TTL = 6 * 60 * 60
+
+
+class RosterHandlers:
+    async def _render_event_roster(
+        self, event_id: int
+    ) -> typing.Tuple[str, typing.Optional[InlineKeyboardMarkup]]:
+        roster = await self._events_storage.registrations.get_event_roster(event_id)
+        message = ""
+        buttons = []
+        for user, registration in roster:
+            if registration.late == 0:
+                message += str(user) + "\n\n"
+            elif registration.late == -1:
+                message += f"<s>{user}</s>\n\n"
+            else:
+                message += str(user) + f"\nОпоздание {registration.late} мин\n\n"
+            buttons.append(
+                [
+                    InlineKeyboardButton(
+                        text=("✅ " if registration.attended else "⬜ ")
+                        + (user.name or str(user.id)),
+                        callback_data=f"attend_{event_id}_{user.id}",
+                    )
+                ]
+            )
+        if not buttons:
+            return message, None
+        return message, InlineKeyboardMarkup(inline_keyboard=buttons)
+
+    async def _show_event_users(self, callback: aiogram.types.CallbackQuery):
+        event_id = int(callback.data.split("_")[2])
+        message, keyboard = await self._render_event_roster(event_id)
+        if message == "":
+            await callback.answer("Никто не записан")
+        else:
+            sent = await callback.message.answer(message, reply_markup=keyboard)
+            self._live_rosters.setdefault(event_id, {})[
+                (sent.chat.id, sent.message_id)
+            ] = (time.monotonic() + LIVE_ROSTER_TTL)
+
+    async def _toggle_attendance(self, callback: aiogram.types.CallbackQuery):
+        event_id = int(callback.data.split("_")[1])
+        user_id = int(callback.data.split("_")[2])
+        attended = await self._events_storage.registrations.toggle_attended(
+            user_id, event_id
+        )
+        if attended is None:
+            await callback.answer("Участник больше не записан")
+        else:
+            await callback.answer("Пришёл" if attended else "Отметка снята")
+        message, keyboard = await self._render_event_roster(event_id)
+        if message == "":
+            await callback.message.delete()
+            return
+        try:
+            await callback.message.edit_text(message, reply_markup=keyboard)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
+
+    def _on_registration_change(self, op: str, key: str):
+        event_ids = list(self._live_rosters) if op == RELOAD or not key else [int(key)]
+        for event_id in event_ids:
+            if event_id in self._live_rosters:
+                self._roster_edits.touch(event_id)
+
+    async def _refresh_live_rosters(self, event_id: int):
+        messages = self._live_rosters.get(event_id, {})
+        now = time.monotonic()
+        for key, expires_at in list(messages.items()):
+            if expires_at <= now:
+                del messages[key]
+        if not messages:
+            self._live_rosters.pop(event_id, None)
+            self._roster_edits.forget(event_id)
+            return
+        text, keyboard = await self._render_event_roster(event_id)
+        for chat_id, message_id in list(messages):
+            for _ in range(2):
+                try:
+                    await self._bot.edit_message_text(
+                        text or "Никто не записан",
+                        chat_id=chat_id,
+                        message_id=message_id,
+                        reply_markup=keyboard,
+                    )
+                    break
+                except TelegramRetryAfter as error:
+                    await asyncio.sleep(error.retry_after)
+                except TelegramBadRequest as error:
+                    if "not modified" not in error.message:
+                        messages.pop((chat_id, message_id), None)
+                    break
+                except TelegramForbiddenError:
+                    messages.pop((chat_id, message_id), None)
+                    break
+
+    def _roster_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="roster")
+        router.callback_query.filter(self._admin_only)
+        router.callback_query.register(
+            self._show_event_users, aiogram.F.data.startswith("event_users_")
+        )
+        router.callback_query.register(
+            self._toggle_attendance, aiogram.F.data.startswith("attend_")
+        )
+        return router
@@ -0,0 +1,108 @@
+import html
+import typing
+from datetime import datetime, timedelta
+
+import aiogram
+from aiogram.filters.command import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from db.storage import User
+
+
+SEARCH_PAGE_SIZE = 10
+
+
+class SearchHandlers:
+    def _parse_search_query(self, text: str) -> typing.Optional[dict]:
+        query = {"text": [], "city": None, "date_from": None, "date_to": None}
+        for token in text.split()[1:]:
+            key, _, value = token.partition(":")
+            key = key.lower()
+            if key == "город" and value:
+                cities = {name.lower(): code for code, name in User.locations.items()}
+                query["city"] = cities.get(value.lower(), value)
+            elif key in ("с", "по") and value:
+                try:
+                    date = datetime.strptime(value, "%d.%m.%Y")
+                except ValueError:
+                    return None
+                if key == "с":
+                    query["date_from"] = date.isoformat()
+                else:
+                    query["date_to"] = (date + timedelta(days=1)).isoformat()
+            else:
+                query["text"].append(token)
+        query["text"] = " ".join(query["text"])
+        return query
+
+    async def _render_search_page(
+        self, query: dict, page: int
+    ) -> typing.Tuple[str, typing.Optional[InlineKeyboardMarkup]]:
+        events, total = await self._events_storage.search_events(
+            text=query["text"] or None,
+            city=query["city"],
+            date_from=query["date_from"] and datetime.fromisoformat(query["date_from"]),
+            date_to=query["date_to"] and datetime.fromisoformat(query["date_to"]),
+            limit=SEARCH_PAGE_SIZE,
+            offset=page * SEARCH_PAGE_SIZE,
+        )
+        if total == 0:
+            return "Ничего не найдено", None
+        pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+        message = f"Найдено забегов: {total}, страница {page + 1} из {pages}\n\n"
+        for event in events:
+            description = event.description or ""
+            if len(description) > 80:
+                description = description[:80] + "…"
+            message += (
+                f"<b>#{event.id}</b> {event.date.strftime('%d.%m.%Y %H:%M')}, "
+                f"{User.locations.get(event.city, event.city)}, "
+                f"{html.escape(event.location or '')}\n"
+                f"{html.escape(description)}\n\n"
+            )
+        buttons = []
+        if page > 0:
+            buttons.append(
+                InlineKeyboardButton(text="⬅️", callback_data=f"search_page_{page - 1}")
+            )
+        if page + 1 < pages:
+            buttons.append(
+                InlineKeyboardButton(text="➡️", callback_data=f"search_page_{page + 1}")
+            )
+        if not buttons:
+            return message, None
+        return message, InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+    async def _search_events(self, message: aiogram.types.Message, state: FSMContext):
+        query = self._parse_search_query(message.text)
+        if query is None:
+            await message.answer(
+                "Использование: /search [текст] [город:Москва] [с:01.05.2024] [по:31.05.2024]"
+            )
+            return
+        await state.update_data(search=query)
+        text, keyboard = await self._render_search_page(query, 0)
+        await message.answer(text, reply_markup=keyboard)
+
+    async def _show_search_page(
+        self, callback: aiogram.types.CallbackQuery, state: FSMContext
+    ):
+        query = (await state.get_data()).get("search")
+        if query is None:
+            await callback.answer("Поиск устарел, повторите /search")
+            return
+        text, keyboard = await self._render_search_page(
+            query, int(callback.data.split("_")[-1])
+        )
+        await callback.message.edit_text(text, reply_markup=keyboard)
+
+    def _search_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="search")
+        router.message.filter(self._admin_only)
+        router.callback_query.filter(self._admin_only)
+        router.message.register(self._search_events, Command(commands=["search"]))
+        router.callback_query.register(
+            self._show_search_page, aiogram.F.data.startswith("search_page_")
+        )
+        return router
@@ -0,0 +1,29 @@
+from aiogram.fsm.state import State, StatesGroup
+
+
+class GetUserData(StatesGroup):
+    name = State()
+    phone = State()
+    emergency_contact = State()
+
+
+class GetEventData(StatesGroup):
+    city = State()
+    photo = State()
+    description = State()
+    date = State()
+    location = State()
+    tempo = State()
+
+
+class ConfirmDeletingEvent(StatesGroup):
+    confirmation = State()
+
+
+class EditEventData(StatesGroup):
+    city = State()
+    photo = State()
+    description = State()
+    date = State()
+    location = State()
+    tempo = State()
@@ -0,0 +1,79 @@
+import html
+
+import aiogram
+from aiogram.filters.command import Command
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from captions import EventCaptions
+from db.storage import User, EventTemplate
+
+
+class TemplateHandlers:
+    async def _create_template(self, message: aiogram.types.Message):
+        splitted_message_text = message.text.split()
+        if len(splitted_message_text) != 2 or not splitted_message_text[1].isdigit():
+            await message.answer("Использование: /template_from <номер забега>")
+            return
+        template_id = await self._events_storage.templates.create_from_event(
+            int(splitted_message_text[1])
+        )
+        if template_id is None:
+            await message.answer("Забег не найден")
+            return
+        created = await self._events_storage.templates.materialize(
+            self._template_weeks_ahead
+        )
+        await message.answer(
+            f"Шаблон #{template_id} создан, добавлено забегов: {created}"
+        )
+
+    def _describe_template(self, template: EventTemplate) -> str:
+        return (
+            f"<b>#{template.id}</b> {EventCaptions.russian_days[template.weekday]} "
+            f"{template.start_time.strftime('%H:%M')}, "
+            f"{User.locations.get(template.city, template.city)}, "
+            f"{html.escape(template.location or '')}"
+        )
+
+    async def _show_templates(self, message: aiogram.types.Message):
+        templates = await self._events_storage.templates.get_active()
+        if not templates:
+            await message.answer(
+                "Активных шаблонов нет. Создайте шаблон: /template_from <номер забега>"
+            )
+            return
+        await message.answer(
+            "Шаблоны забегов:\n\n"
+            + "\n".join(self._describe_template(template) for template in templates),
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [
+                        InlineKeyboardButton(
+                            text=f"Отключить #{template.id}",
+                            callback_data=f"template_off_{template.id}",
+                        )
+                    ]
+                    for template in templates
+                ]
+            ),
+        )
+
+    async def _deactivate_template(self, callback: aiogram.types.CallbackQuery):
+        template_id = int(callback.data.split("_")[-1])
+        if await self._events_storage.templates.deactivate(template_id):
+            await callback.answer(f"Шаблон #{template_id} отключён")
+        else:
+            await callback.answer("Шаблон уже отключён")
+
+    def _templates_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="templates")
+        router.message.filter(self._admin_only)
+        router.callback_query.filter(self._admin_only)
+        router.message.register(
+            self._create_template, Command(commands=["template_from"])
+        )
+        router.message.register(self._show_templates, Command(commands=["templates"]))
+        router.callback_query.register(
+            self._deactivate_template, aiogram.F.data.startswith("template_off_")
+        )
+        return router
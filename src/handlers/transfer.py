@@ -0,0 +1,110 @@
+import csv
+import io
+import os
+import tempfile
+import typing
+
+import aiogram
+from aiogram.filters.command import Command
+
+from db.storage import User
+
+
+class TransferHandlers:
+    async def _send_csv(
+        self,
+        message: aiogram.types.Message,
+        rows: typing.AsyncIterator[typing.Sequence],
+        columns: typing.Sequence[str],
+        filename: str,
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, filename)
+            with open(path, "w", newline="", encoding="utf-8-sig") as file:
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                async for row in rows:
+                    writer.writerow(row)
+            await message.answer_document(
+                aiogram.types.FSInputFile(path, filename=filename)
+            )
+
+    async def _read_csv(self, message: aiogram.types.Message) -> typing.List[dict]:
+        buffer = await self._bot.download(message.document)
+        return list(
+            csv.DictReader(io.TextIOWrapper(buffer, encoding="utf-8-sig", newline=""))
+        )
+
+    async def _export_users(self, message: aiogram.types.Message):
+        await self._send_csv(
+            message,
+            self._users_storage.iter_members(),
+            self._users_storage.export_columns,
+            "members.csv",
+        )
+
+    async def _export_event(self, message: aiogram.types.Message):
+        splitted_message_text = message.text.split()
+        if len(splitted_message_text) != 2 or not splitted_message_text[1].isdigit():
+            await message.answer("Использование: /export_event <номер забега>")
+            return
+        event_id = int(splitted_message_text[1])
+        if await self._events_storage.get_by_id(event_id) is None:
+            await message.answer("Забег не найден")
+            return
+        await self._send_csv(
+            message,
+            self._events_storage.registrations.iter_event_roster(event_id),
+            self._events_storage.registrations.export_columns,
+            f"event_{event_id}.csv",
+        )
+
+    async def _import_users(self, message: aiogram.types.Message):
+        try:
+            records = [
+                (
+                    int(row["id"]),
+                    row.get("name") or None,
+                    row.get("phone") or None,
+                    row.get("emergency_contact") or None,
+                    row.get("role") or User.USER,
+                    row.get("location") or "1",
+                )
+                for row in await self._read_csv(message)
+            ]
+        except (KeyError, ValueError, UnicodeDecodeError):
+            await message.answer("Неверный формат файла")
+            return
+        imported = await self._users_storage.import_members(records)
+        await message.answer(
+            f"Импортировано пользователей: {imported} из {len(records)}"
+        )
+
+    async def _import_registrations(self, message: aiogram.types.Message):
+        try:
+            records = [
+                (int(row["user_id"]), int(row["event_id"]), int(row.get("late") or 0))
+                for row in await self._read_csv(message)
+            ]
+        except (KeyError, ValueError, UnicodeDecodeError):
+            await message.answer("Неверный формат файла")
+            return
+        imported = await self._events_storage.registrations.import_registrations(
+            records
+        )
+        await message.answer(f"Импортировано регистраций: {imported} из {len(records)}")
+
+    def _transfer_router(self) -> aiogram.Router:
+        router = aiogram.Router(name="transfer")
+        router.message.filter(self._admin_only)
+        router.message.register(self._export_users, Command(commands=["export_users"]))
+        router.message.register(self._export_event, Command(commands=["export_event"]))
+        router.message.register(
+            self._import_users, Command(commands=["import_users"]), aiogram.F.document
+        )
+        router.message.register(
+            self._import_registrations,
+            Command(commands=["import_registrations"]),
+            aiogram.F.document,
+        )
+        return router
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from db.storage import Event, EventsStorage, User
+
+
+logger = logging.getLogger(__name__)
+
+REFRESH_RETRY_DELAY = 1
+REFRESH_MAX_DELAY = 30
+
+
+class UpcomingEvents:
+    def __init__(self, events_storage: EventsStorage, max_results: int = 50):
+        self._events_storage = events_storage
+        self._max_results = max_results
+        self._events: List[Tuple[Event, str]] = []
+        self._stale = False
+        self._reload_task: Optional[asyncio.Task] = None
+
+    async def init(self):
+        await self._events_storage.subscribe(self._on_change)
+        await self.reload()
+
+    async def reload(self):
+        events = await self._events_storage.get_all_events(actual_only=True)
+        self._events = [(event, self._haystack(event)) for event in events]
+
+    def search(self, query: str) -> List[Event]:
+        now = datetime.now()
+        terms = query.lower().split()
+        results = []
+        for event, haystack in self._events:
+            if event.date <= now:
+                continue
+            if all(term in haystack for term in terms):
+                results.append(event)
+                if len(results) >= self._max_results:
+                    break
+        return results
+
+    def _haystack(self, event: Event) -> str:
+        return " ".join(
+            (
+                User.locations.get(event.city, event.city or ""),
+                event.description or "",
+                event.location or "",
+                event.tempo or "",
+                event.date.strftime("%d.%m"),
+            )
+        ).lower()
+
+    def _on_change(self, op: str, key: str):
+        self._stale = True
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        delay = REFRESH_RETRY_DELAY
+        while self._stale:
+            self._stale = False
+            try:
+                await self.reload()
+            except Exception as error:
+                logger.warning(
+                    "Failed to reload upcoming events",
+                    extra={"retry_in": delay, "error": repr(error)},
+                )
+                self._stale = True
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, REFRESH_MAX_DELAY)
@@ -0,0 +1,232 @@
+import abc
+import asyncio
+import dataclasses
+import json
+import time
+import typing
+from collections import OrderedDict
+from datetime import datetime
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+
+class KV(abc.ABC):
+    def __init__(self):
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> typing.Optional[str]:
+        pass
+
+    @abc.abstractmethod
+    async def mget(self, keys: typing.List[str]) -> typing.List[typing.Optional[str]]:
+        pass
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: str, ttl: typing.Optional[float] = None):
+        pass
+
+    @abc.abstractmethod
+    async def mset(
+        self, items: typing.Dict[str, str], ttl: typing.Optional[float] = None
+    ):
+        pass
+
+    @abc.abstractmethod
+    async def delete(self, *keys: str):
+        pass
+
+    @abc.abstractmethod
+    async def delete_prefix(self, prefix: str):
+        pass
+
+    def discard(self, *keys: str):
+        self._spawn(self.delete(*keys))
+
+    def discard_prefix(self, prefix: str):
+        self._spawn(self.delete_prefix(prefix))
+
+    def _spawn(self, coro: typing.Coroutine):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        pass
+
+
+class MemoryKV(KV):
+    def __init__(self, max_size: typing.Optional[int] = 16384):
+        super().__init__()
+        self._data: OrderedDict[str, typing.Tuple[str, typing.Optional[float]]] = (
+            OrderedDict()
+        )
+        self._max_size = max_size
+
+    def _get(self, key: str) -> typing.Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: str, ttl: typing.Optional[float]):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        if self._max_size is not None and len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+
+    async def get(self, key: str) -> typing.Optional[str]:
+        return self._get(key)
+
+    async def mget(self, keys: typing.List[str]) -> typing.List[typing.Optional[str]]:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ttl: typing.Optional[float] = None):
+        self._set(key, value, ttl)
+
+    async def mset(
+        self, items: typing.Dict[str, str], ttl: typing.Optional[float] = None
+    ):
+        for key, value in items.items():
+            self._set(key, value, ttl)
+
+    async def delete(self, *keys: str):
+        self.discard(*keys)
+
+    async def delete_prefix(self, prefix: str):
+        self.discard_prefix(prefix)
+
+    def discard(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def discard_prefix(self, prefix: str):
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            del self._data[key]
+
+
+class RedisKV(KV):
+    def __init__(self, url: str, namespace: str = "physhka:"):
+        from redis import asyncio as redis
+
+        super().__init__()
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._namespace = namespace
+
+    async def get(self, key: str) -> typing.Optional[str]:
+        return await self._redis.get(self._namespace + key)
+
+    async def mget(self, keys: typing.List[str]) -> typing.List[typing.Optional[str]]:
+        if not keys:
+            return []
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(self._namespace + key)
+            return await pipe.execute()
+
+    async def set(self, key: str, value: str, ttl: typing.Optional[float] = None):
+        await self._redis.set(
+            self._namespace + key, value, px=int(ttl * 1000) if ttl else None
+        )
+
+    async def mset(
+        self, items: typing.Dict[str, str], ttl: typing.Optional[float] = None
+    ):
+        if not items:
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(
+                    self._namespace + key, value, px=int(ttl * 1000) if ttl else None
+                )
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*(self._namespace + key for key in keys))
+
+    async def delete_prefix(self, prefix: str):
+        batch = []
+        async for key in self._redis.scan_iter(
+            match=self._namespace + prefix + "*", count=500
+        ):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._redis.unlink(*batch)
+                batch = []
+        if batch:
+            await self._redis.unlink(*batch)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_kv(
+    backend: str,
+    redis_url: typing.Optional[str] = None,
+    namespace: str = "physhka:",
+    max_size: typing.Optional[int] = 16384,
+) -> KV:
+    if backend == "memory":
+        return MemoryKV(max_size)
+    if backend == "redis":
+        return RedisKV(redis_url, namespace)
+    raise ValueError(f"Unknown kv backend: {backend}")
+
+
+def dump_record(record: typing.Any) -> str:
+    return json.dumps(
+        [getattr(record, column) for column in record.columns],
+        ensure_ascii=False,
+        default=datetime.isoformat,
+    )
+
+
+def load_record(cls: type, value: str) -> typing.Any:
+    types = {field.name: field.type for field in dataclasses.fields(cls)}
+    values = json.loads(value)
+    for index, column in enumerate(cls.columns):
+        if types[column] is datetime and values[index] is not None:
+            values[index] = datetime.fromisoformat(values[index])
+    return cls(*values)
+
+
+class KVStorage(BaseStorage):
+    def __init__(self, kv: KV):
+        self._kv = kv
+
+    def _key(self, key: StorageKey, part: str) -> str:
+        return (
+            f"fsm:{key.bot_id}:{key.chat_id}:{key.user_id}:"
+            f"{key.thread_id or ''}:{key.destiny}:{part}"
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        if state is None:
+            await self._kv.delete(self._key(key, "state"))
+            return
+        await self._kv.set(
+            self._key(key, "state"), state.state if isinstance(state, State) else state
+        )
+
+    async def get_state(self, key: StorageKey) -> typing.Optional[str]:
+        return await self._kv.get(self._key(key, "state"))
+
+    async def set_data(self, key: StorageKey, data: typing.Dict[str, typing.Any]):
+        if not data:
+            await self._kv.delete(self._key(key, "data"))
+            return
+        await self._kv.set(self._key(key, "data"), json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> typing.Dict[str, typing.Any]:
+        value = await self._kv.get(self._key(key, "data"))
+        return json.loads(value) if value else {}
+
+    async def close(self):
+        pass
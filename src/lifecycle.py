@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import signal
+import time
+import typing
+
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    def __init__(self, drain_timeout: float = 25):
+        self._drain_timeout = drain_timeout
+        self._stopping = asyncio.Event()
+        self._tasks: typing.Set[asyncio.Task] = set()
+        self._drainers: typing.List[typing.Callable[[float], typing.Awaitable]] = []
+        self._closers: typing.List[typing.Callable[[], typing.Awaitable]] = []
+        self._started_at = time.monotonic()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.stop)
+
+    def stop(self):
+        self._stopping.set()
+
+    async def sleep(self, delay: float) -> bool:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        return self.stopping
+
+    def spawn(self, coro: typing.Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def on_drain(self, drainer: typing.Callable[[float], typing.Awaitable]):
+        self._drainers.append(drainer)
+
+    def on_close(self, closer: typing.Callable[[], typing.Awaitable]):
+        self._closers.append(closer)
+
+    def started(self, name: str):
+        logger.info(
+            f"{name} started",
+            extra={"startup_seconds": round(time.monotonic() - self._started_at, 3)},
+        )
+
+    async def run(
+        self,
+        serve: typing.Awaitable,
+        stop_intake: typing.Callable[[], typing.Awaitable],
+    ):
+        serving = asyncio.ensure_future(serve)
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({serving, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        self.stop()
+        try:
+            if not serving.done():
+                await stop_intake()
+                await asyncio.wait({serving}, timeout=self._drain_timeout)
+                if not serving.done():
+                    serving.cancel()
+        finally:
+            await self.shutdown()
+        if not serving.cancelled():
+            serving.result()
+
+    async def shutdown(self):
+        started_at = time.monotonic()
+        deadline = started_at + self._drain_timeout
+        for drainer in self._drainers:
+            await drainer(max(deadline - time.monotonic(), 0))
+        if self._tasks:
+            _, pending = await asyncio.wait(
+                set(self._tasks), timeout=max(deadline - time.monotonic(), 0)
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        for closer in reversed(self._closers):
+            try:
+                await closer()
+            except Exception:
+                logger.exception("Failed to close %r", closer)
+        logger.info(
+            "Drained and stopped",
+            extra={"drain_seconds": round(time.monotonic() - started_at, 3)},
+        )
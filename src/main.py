@@ -1,14 +1,34 @@
 import asyncio
+import functools
+import logging
 
+import aiogram
 import aioschedule
 
+from access import AccessControl
 from db.db import DB
+from db.migrations import migrate
+from kv import KV, KVStorage, create_kv
+from lifecycle import Lifecycle
 from bot import TG_Bot
 from config_reader import config
 from db.storage import UsersStorage, EventsStorage
+from telemetry import setup_logging
+from sharding import (
+    ShardIngress,
+    shard_socket_path,
+    start_worker,
+    start_workers,
+    stop_workers,
+)
 
 
-async def init_db():
+logger = logging.getLogger(__name__)
+
+WORKER_CLOSE_GRACE = 5
+
+
+async def init_db(lifecycle: Lifecycle, kv: KV):
     db = DB(
         host=config.host.get_secret_value(),
         port=config.port.get_secret_value(),
@@ -16,32 +36,106 @@ async def init_db():
         password=config.password.get_secret_value(),
         database=config.database.get_secret_value(),
     )
-    await db.init()
-    users_storage = UsersStorage(db)
-    await users_storage.init()
-    events_storage = EventsStorage(db)
-    await events_storage.init()
+    users_storage = UsersStorage(db, kv)
+    events_storage = EventsStorage(db, kv)
+    await asyncio.gather(db.init(), users_storage.init(), events_storage.init())
+    lifecycle.on_close(db.close)
+    await migrate(db)
     return users_storage, events_storage
 
 
-async def check_schedule():
-    while True:
+async def check_schedule(lifecycle: Lifecycle):
+    while not lifecycle.stopping:
         await aioschedule.run_pending()
-        await asyncio.sleep(1)
+        await lifecycle.sleep(1)
 
 
-async def main():
-    users_storage, events_storage = await init_db()
+async def init_bot(lifecycle: Lifecycle):
+    kv = create_kv(config.kv_backend, config.redis_url)
+    lifecycle.on_close(kv.close)
+    fsm_kv = create_kv(
+        config.kv_backend, config.redis_url, namespace="physhka:fsm:", max_size=None
+    )
+    lifecycle.on_close(fsm_kv.close)
+    users_storage, events_storage = await init_db(lifecycle, kv)
+    access = AccessControl(users_storage, config.admin_ids)
     tg_bot = TG_Bot(
         bot_token=config.tgbot_api_key.get_secret_value(),
         users_storage=users_storage,
         events_storage=events_storage,
+        access=access,
+        template_weeks_ahead=config.template_weeks_ahead,
+        cache_chat_id=config.cache_chat_id,
+        fsm_storage=KVStorage(fsm_kv),
+    )
+    lifecycle.on_close(tg_bot.close)
+    await asyncio.gather(access.init(), tg_bot.init())
+    lifecycle.on_drain(tg_bot.drain)
+    return tg_bot, events_storage
+
+
+def schedule_jobs(events_storage: EventsStorage, lifecycle: Lifecycle):
+    aioschedule.every().day.at("04:00").do(
+        events_storage.archive_finished, keep_days=config.archive_after_days
+    )
+    aioschedule.every().day.at("04:10").do(
+        events_storage.templates.materialize, weeks=config.template_weeks_ahead
+    )
+
+    lifecycle.spawn(check_schedule(lifecycle))
+
+
+async def run_worker(index: int):
+    lifecycle = Lifecycle(config.drain_timeout)
+    lifecycle.install_signal_handlers()
+    tg_bot, events_storage = await init_bot(lifecycle)
+    if index == 0:
+        schedule_jobs(events_storage, lifecycle)
+    lifecycle.started(f"Bot worker {index}")
+    await lifecycle.run(
+        tg_bot.serve_shard(shard_socket_path(config.shard_socket_dir, index)),
+        tg_bot.stop,
     )
-    await tg_bot.init()
 
-    asyncio.create_task(check_schedule())
 
-    await tg_bot.start()
+def worker_main(index: int):
+    setup_logging(config.log_level, config.spans_path)
+    asyncio.run(run_worker(index))
+
+
+async def run_ingress():
+    lifecycle = Lifecycle(config.drain_timeout + WORKER_CLOSE_GRACE)
+    lifecycle.install_signal_handlers()
+    workers = start_workers(worker_main, config.workers)
+    lifecycle.on_drain(functools.partial(stop_workers, workers))
+    bot = aiogram.Bot(token=config.tgbot_api_key.get_secret_value())
+    lifecycle.on_close(bot.session.close)
+    socket_paths = [
+        shard_socket_path(config.shard_socket_dir, index)
+        for index in range(config.workers)
+    ]
+    ingress = ShardIngress(
+        bot, socket_paths, workers, functools.partial(start_worker, worker_main)
+    )
+    logger.info(
+        "Bot ingress is distributing updates", extra={"workers": config.workers}
+    )
+    await lifecycle.run(ingress.run(), ingress.stop)
+
+
+async def main():
+    setup_logging(config.log_level, config.spans_path)
+    if config.workers > 1:
+        await run_ingress()
+        return
+
+    lifecycle = Lifecycle(config.drain_timeout)
+    lifecycle.install_signal_handlers()
+    tg_bot, events_storage = await init_bot(lifecycle)
+    schedule_jobs(events_storage, lifecycle)
+    lifecycle.started("Bot")
+
+    await lifecycle.run(tg_bot.start(), tg_bot.stop)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+import typing
+
+import aiogram
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from access import AccessControl
+from telemetry import correlation_id, span
+
+
+logger = logging.getLogger(__name__)
+
+
+class AccessMiddleware(BaseMiddleware):
+    def __init__(self, access: AccessControl):
+        self._access = access
+
+    async def __call__(
+        self,
+        handler: typing.Callable[
+            [TelegramObject, typing.Dict[str, typing.Any]], typing.Awaitable[typing.Any]
+        ],
+        event: TelegramObject,
+        data: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        user: aiogram.types.User = data.get("event_from_user")
+        if user is not None and self._access.is_blocked(user.id):
+            if isinstance(event, aiogram.types.CallbackQuery):
+                await event.answer()
+            return None
+        return await handler(event, data)
+
+
+class RepeatedTapMiddleware(BaseMiddleware):
+    def __init__(self, debounce: float = 1.5, max_recent: int = 4096):
+        self._recent: typing.Dict[typing.Tuple, float] = {}
+        self._debounce = debounce
+        self._max_recent = max_recent
+
+    async def __call__(
+        self,
+        handler: typing.Callable[
+            [TelegramObject, typing.Dict[str, typing.Any]], typing.Awaitable[typing.Any]
+        ],
+        event: aiogram.types.CallbackQuery,
+        data: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        chat: aiogram.types.Chat = data.get("event_chat")
+        user: aiogram.types.User = data.get("event_from_user")
+        key = chat.id if chat is not None else user.id if user is not None else None
+        if key is None:
+            return await handler(event, data)
+
+        message_id = event.message.message_id if event.message else None
+        tap = (key, message_id, event.data)
+        if self._is_repeated(tap):
+            await event.answer()
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            self._recent[tap] = time.monotonic()
+
+    def _is_repeated(self, tap: typing.Tuple) -> bool:
+        now = time.monotonic()
+        if now - self._recent.get(tap, float("-inf")) < self._debounce:
+            return True
+        if len(self._recent) >= self._max_recent:
+            self._recent = {
+                recent_tap: tapped_at
+                for recent_tap, tapped_at in self._recent.items()
+                if now - tapped_at < self._debounce
+            }
+        self._recent[tap] = now
+        return False
+
+
+class InFlightMiddleware(BaseMiddleware):
+    def __init__(self):
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def __call__(
+        self,
+        handler: typing.Callable[
+            [TelegramObject, typing.Dict[str, typing.Any]], typing.Awaitable[typing.Any]
+        ],
+        event: TelegramObject,
+        data: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class TracingMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: typing.Callable[
+            [TelegramObject, typing.Dict[str, typing.Any]], typing.Awaitable[typing.Any]
+        ],
+        event: aiogram.types.Update,
+        data: typing.Dict[str, typing.Any],
+    ) -> typing.Any:
+        user: aiogram.types.User = data.get("event_from_user")
+        with span(
+            f"update.{event.event_type}",
+            **{
+                "telegram.update_id": event.update_id,
+                "telegram.user_id": user.id if user is not None else None,
+            },
+        ) as current:
+            token = correlation_id.set(current.trace_id)
+            try:
+                return await handler(event, data)
+            finally:
+                logger.debug(
+                    "Update handled",
+                    extra={
+                        "update_id": event.update_id,
+                        "update_type": event.event_type,
+                        "duration_ms": round(current.duration_ms, 2),
+                    },
+                )
+                correlation_id.reset(token)
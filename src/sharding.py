@@ -0,0 +1,253 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+import typing
+
+import aiogram
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff, BackoffConfig
+
+
+logger = logging.getLogger(__name__)
+
+STREAM_LIMIT = 2**20
+CONNECT_INTERVAL = 0.5
+QUIET_CONNECT_ATTEMPTS = 20
+POLLING_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=5.0, factor=1.3, jitter=0.1)
+RESTART_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=30.0, factor=2, jitter=0.1)
+
+
+def shard_socket_path(socket_dir: str, index: int) -> str:
+    return os.path.join(socket_dir, f"worker_{index}.sock")
+
+
+def update_chat_id(update: Update) -> int:
+    event = update.event
+    message = getattr(event, "message", None)
+    if message is not None:
+        return message.chat.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else 0
+
+
+def start_worker(
+    target: typing.Callable[[int], None], index: int
+) -> multiprocessing.Process:
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=target, args=(index,), daemon=True)
+    process.start()
+    return process
+
+
+def start_workers(
+    target: typing.Callable[[int], None], workers: int
+) -> typing.List[multiprocessing.Process]:
+    return [start_worker(target, index) for index in range(workers)]
+
+
+async def stop_workers(processes: typing.List[multiprocessing.Process], timeout: float):
+    for process in processes:
+        process.terminate()
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        await loop.run_in_executor(
+            None, process.join, max(deadline - time.monotonic(), 0)
+        )
+        if process.is_alive():
+            process.kill()
+
+
+class ShardIngress:
+    def __init__(
+        self,
+        bot: aiogram.Bot,
+        socket_paths: typing.List[str],
+        processes: typing.List[multiprocessing.Process],
+        restart: typing.Callable[[int], multiprocessing.Process],
+    ):
+        self._bot = bot
+        self._socket_paths = socket_paths
+        self._processes = processes
+        self._restart = restart
+        self._writers: typing.List[typing.Optional[asyncio.StreamWriter]] = [
+            None
+        ] * len(socket_paths)
+        self._stopping = asyncio.Event()
+
+    async def _pause(self, delay: float) -> bool:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        return self._stopping.is_set()
+
+    async def _connect(self, index: int) -> typing.Optional[asyncio.StreamWriter]:
+        path = self._socket_paths[index]
+        restarts = Backoff(RESTART_BACKOFF)
+        attempt = 0
+        while True:
+            process = self._processes[index]
+            if not process.is_alive():
+                logger.error(
+                    "Bot worker exited, restarting it",
+                    extra={"worker": index, "exitcode": process.exitcode},
+                )
+                if await self._pause(next(restarts)):
+                    return None
+                self._processes[index] = self._restart(index)
+                attempt = 0
+                continue
+            try:
+                _, writer = await asyncio.open_unix_connection(path, limit=STREAM_LIMIT)
+                return writer
+            except (FileNotFoundError, ConnectionRefusedError):
+                attempt += 1
+                if attempt > QUIET_CONNECT_ATTEMPTS:
+                    logger.warning(
+                        "Waiting for bot worker to accept updates",
+                        extra={"worker": index, "attempt": attempt},
+                    )
+                if await self._pause(CONNECT_INTERVAL):
+                    return None
+
+    async def _deliver(self, index: int, lines: typing.List[bytes]):
+        while True:
+            writer = self._writers[index]
+            if writer is None or not self._processes[index].is_alive():
+                if writer is not None:
+                    writer.close()
+                writer = self._writers[index] = await self._connect(index)
+                if writer is None:
+                    return
+            try:
+                writer.writelines(lines)
+                await writer.drain()
+                return
+            except ConnectionError:
+                logger.warning(
+                    "Lost connection to bot worker, reconnecting",
+                    extra={"worker": index},
+                )
+                writer.close()
+                self._writers[index] = None
+
+    async def _dispatch(self, updates: typing.List[Update]):
+        batches: typing.Dict[int, typing.List[bytes]] = {}
+        for update in updates:
+            index = update_chat_id(update) % len(self._socket_paths)
+            batches.setdefault(index, []).append(
+                update.model_dump_json(exclude_unset=True).encode() + b"\n"
+            )
+        await asyncio.gather(
+            *(self._deliver(index, lines) for index, lines in batches.items())
+        )
+
+    async def run(self):
+        try:
+            await self._serve()
+        finally:
+            for writer in self._writers:
+                if writer is not None:
+                    writer.close()
+
+    async def _serve(self):
+        for index in range(len(self._socket_paths)):
+            self._writers[index] = await self._connect(index)
+            if self._writers[index] is None:
+                return
+        await self._bot.delete_webhook()
+        backoff = Backoff(POLLING_BACKOFF)
+        offset = None
+        while not self._stopping.is_set():
+            try:
+                updates = await self._get_updates(offset)
+                await self._dispatch(updates)
+            except TelegramRetryAfter as error:
+                await self._pause(error.retry_after)
+                continue
+            except Exception:
+                logger.exception(
+                    "Failed to fetch or dispatch updates",
+                    extra={"retry_in": round(backoff.next_delay, 1)},
+                )
+                await self._pause(next(backoff))
+                continue
+            backoff.reset()
+            if updates:
+                offset = updates[-1].update_id + 1
+
+    async def _get_updates(self, offset: typing.Optional[int]) -> typing.List[Update]:
+        polling = asyncio.ensure_future(
+            self._bot.get_updates(offset=offset, timeout=30)
+        )
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({polling, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not polling.done():
+            polling.cancel()
+            return []
+        return polling.result()
+
+    async def stop(self):
+        self._stopping.set()
+
+
+class ShardWorker:
+    def __init__(self, dispatcher: aiogram.Dispatcher, bot: aiogram.Bot):
+        self._dispatcher = dispatcher
+        self._bot = bot
+        self._tails: typing.Dict[int, asyncio.Task] = {}
+        self._server: typing.Optional[asyncio.AbstractServer] = None
+
+    async def serve(self, socket_path: str):
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self._server = await asyncio.start_unix_server(
+            self._read_updates, path=socket_path, limit=STREAM_LIMIT
+        )
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                if self._server.is_serving():
+                    raise
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def drain(self, timeout: float):
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()), timeout=timeout)
+
+    async def _read_updates(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        async for line in reader:
+            update = Update.model_validate_json(line, context={"bot": self._bot})
+            chat_id = update_chat_id(update)
+            task = asyncio.create_task(self._process(self._tails.get(chat_id), update))
+            self._tails[chat_id] = task
+            task.add_done_callback(functools.partial(self._forget_tail, chat_id))
+        writer.close()
+
+    def _forget_tail(self, chat_id: int, task: asyncio.Task):
+        if self._tails.get(chat_id) is task:
+            del self._tails[chat_id]
+
+    async def _process(self, previous: typing.Optional[asyncio.Task], update: Update):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self._dispatcher.feed_update(self._bot, update)
+        except Exception:
+            logger.exception("Failed to process update %s", update.update_id)
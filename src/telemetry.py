@@ -0,0 +1,240 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import typing
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+correlation_id: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "correlation_id", default="-"
+)
+current_span: contextvars.ContextVar[typing.Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+SERVICE_NAME = "physhkabot"
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+_LOG_RECORD_FIELDS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None))
+) | {"message", "asctime"}
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "attributes",
+        "start_time_unix_nano",
+        "end_time_unix_nano",
+        "status",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: typing.Optional[str],
+        attributes: typing.Dict[str, typing.Any],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.attributes = attributes
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self.status = {"code": STATUS_CODE_OK}
+
+    def set_attribute(self, key: str, value: typing.Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time_unix_nano or time.time_ns()
+        return (end - self.start_time_unix_nano) / 1e6
+
+    def to_otlp(self) -> dict:
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_time_unix_nano),
+            "endTimeUnixNano": str(self.end_time_unix_nano),
+            "attributes": otlp_attributes(self.attributes),
+            "status": self.status,
+        }
+        if self.parent_span_id is not None:
+            otlp["parentSpanId"] = self.parent_span_id
+        return otlp
+
+
+def otlp_value(value: typing.Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_attributes(attributes: typing.Dict[str, typing.Any]) -> typing.List[dict]:
+    return [
+        {"key": key, "value": otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class FileSpanExporter:
+    def __init__(self, path: str, max_batch: int = 512):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._path = path
+        self._max_batch = max_batch
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._write_batches, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _write_batches(self):
+        with open(self._path, "a", encoding="utf-8") as file:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                while batch[-1] is not None and len(batch) < self._max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    stopping = True
+                    batch.pop()
+                if batch:
+                    file.write(
+                        json.dumps(self._envelope(batch), ensure_ascii=False) + "\n"
+                    )
+                    file.flush()
+
+    def _envelope(self, spans: typing.List[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": otlp_attributes({"service.name": SERVICE_NAME})
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+_exporter: typing.Optional[FileSpanExporter] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": correlation_id.get(),
+        }
+        span = current_span.get()
+        if span is not None:
+            payload["trace_id"] = span.trace_id
+            payload["span_id"] = span.span_id
+        for key, value in vars(record).items():
+            if key not in _LOG_RECORD_FIELDS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "INFO", spans_path: typing.Optional[str] = None):
+    global _exporter
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    if spans_path:
+        _exporter = FileSpanExporter(spans_path)
+        atexit.register(_exporter.close)
+
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+@contextmanager
+def span(name: str, **attributes) -> typing.Iterator[Span]:
+    parent = current_span.get()
+    current = Span(
+        name,
+        parent.trace_id if parent is not None else new_trace_id(),
+        parent.span_id if parent is not None else None,
+        attributes,
+    )
+    token = current_span.set(current)
+    try:
+        yield current
+    except BaseException as error:
+        current.status = {"code": STATUS_CODE_ERROR, "message": repr(error)}
+        raise
+    finally:
+        try:
+            current_span.reset(token)
+        except ValueError:
+            pass
+        current.end_time_unix_nano = time.time_ns()
+        if _exporter is not None:
+            _exporter.export(current)
+
+
+def traced(name: str) -> typing.Callable:
+    def decorator(func: typing.Callable) -> typing.Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_methods(cls: type) -> type:
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(value):
+            setattr(cls, name, traced(f"{cls.__name__}.{name}")(value))
+    return cls
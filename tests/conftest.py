@@ -0,0 +1,30 @@
+import os
+import typing
+import urllib.parse
+
+import pytest
+
+
+TEST_DSN = os.environ.get("PHYSHKA_TEST_DSN")
+TEST_REDIS = os.environ.get("PHYSHKA_TEST_REDIS")
+
+
+@pytest.fixture
+def postgres() -> typing.Dict[str, str]:
+    if not TEST_DSN:
+        pytest.skip("PHYSHKA_TEST_DSN is not set")
+    url = urllib.parse.urlsplit(TEST_DSN)
+    return {
+        "host": url.hostname or "localhost",
+        "port": str(url.port or 5432),
+        "login": urllib.parse.unquote(url.username or "postgres"),
+        "password": urllib.parse.unquote(url.password or ""),
+        "database": url.path.lstrip("/") or "postgres",
+    }
+
+
+@pytest.fixture
+def redis_url() -> str:
+    if not TEST_REDIS:
+        pytest.skip("PHYSHKA_TEST_REDIS is not set")
+    return TEST_REDIS
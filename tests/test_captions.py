@@ -0,0 +1,66 @@
+import html
+import re
+from datetime import datetime
+
+from captions import CAPTION_LIMIT, EventCaptions, _utf16_length
+from db.storage import Event
+
+
+def make_event(description: str, **fields) -> Event:
+    return Event(
+        city="1",
+        description=description,
+        date=datetime(2024, 6, 1, 8, 30),
+        location="Парк Горького",
+        tempo="6:00",
+        photo_id="photo",
+        id=1,
+        updated_at=datetime(2024, 5, 1),
+        **fields,
+    )
+
+
+def test_short_caption_is_left_intact():
+    caption = EventCaptions().render(
+        make_event("Лёгкая пробежка"), suffix="Записано: 3"
+    )
+    assert caption.startswith("Лёгкая пробежка\n\nСуббота 01.06 в 08:30")
+    assert caption.endswith("Записано: 3")
+
+
+def test_long_description_is_truncated_to_the_utf16_limit():
+    description = "🏃" * 600 + "конец"
+    caption = EventCaptions().render(make_event(description), prefix="⚠️ ")
+    assert _utf16_length(caption) <= CAPTION_LIMIT
+    assert "конец" not in caption
+    assert "…\n\nСуббота" in caption
+    assert caption.startswith("⚠️ 🏃")
+    assert "�" not in caption
+
+
+def test_render_is_cached_per_event_version():
+    captions = EventCaptions()
+    event = make_event("Забег")
+    first = captions.render(event)
+    event.description = "Другой забег"
+    assert captions.render(event) is first
+    event.updated_at = datetime(2024, 5, 2)
+    assert captions.render(event).startswith("Другой забег")
+
+
+def test_description_is_escaped_after_truncation():
+    description = "Темп <5:00 & " + "R&D " * 400
+    caption = EventCaptions().render(make_event(description))
+    visible = html.unescape(caption)
+    assert _utf16_length(visible) <= CAPTION_LIMIT
+    assert caption.startswith("Темп &lt;5:00 &amp; R&amp;D")
+    body = caption.split("…")[0]
+    assert re.fullmatch(r"(?:[^&<>]|&(?:amp|lt|gt|quot|#x27);)*", body)
+
+
+def test_location_and_tempo_are_escaped():
+    event = make_event("Забег")
+    event.location = "Парк <Сокольники>"
+    event.tempo = "5:30 & 6:00"
+    caption = EventCaptions().render(event)
+    assert "📍Парк &lt;Сокольники&gt;\n5:30 &amp; 6:00" in caption
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime
+from unittest import mock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
+
+import handlers.cards
+from db.resilience import DatabaseUnavailable
+from db.storage import Event, EventMessage
+from handlers.cards import EventCards
+
+
+def make_event() -> Event:
+    return Event(
+        "1",
+        "Интервалы",
+        datetime(2030, 6, 1, 8),
+        "Стадион",
+        "5:00",
+        "large",
+        id=7,
+        photo_ids=["tiny", "small", "medium", "large"],
+    )
+
+
+class FakeCards(EventCards):
+    def __init__(self):
+        self._cache_chat_id = -100
+        self._bot = mock.Mock()
+        self._bot.send_photo = mock.AsyncMock()
+        self._events_storage = mock.Mock()
+        self._events_storage.drop_photo_size = mock.AsyncMock()
+        self._events_storage.messages.get_sent_since = mock.AsyncMock()
+        self._events_storage.registrations.get_event_lates = mock.AsyncMock(
+            return_value={}
+        )
+        self._event_fanouts = {}
+
+    def _event_card(self, event, kind, user_id=None, late=None):
+        return event.description, None
+
+
+def bad_request(message: str) -> TelegramBadRequest:
+    return TelegramBadRequest(method=mock.Mock(), message=message)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Bad Request: wrong file identifier/HTTP URL specified",
+        "Bad Request: wrong remote file identifier specified: can't unserialize it",
+        "Bad Request: FILE_REFERENCE_EXPIRED",
+    ],
+)
+def test_stale_photo_sizes_are_dropped(message):
+    cards = FakeCards()
+    cards._bot.send_photo.side_effect = bad_request(message)
+    asyncio.run(cards._prewarm_event_photo(make_event()))
+    assert cards._events_storage.drop_photo_size.await_args_list == [
+        mock.call(7, "medium"),
+        mock.call(7, "large"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Bad Request: file is too big",
+        "Bad Request: wrong file type",
+        "Bad Request: PHOTO_INVALID_DIMENSIONS",
+    ],
+)
+def test_other_media_errors_keep_the_stored_sizes(message):
+    cards = FakeCards()
+    cards._bot.send_photo.side_effect = bad_request(message)
+    asyncio.run(cards._prewarm_event_photo(make_event()))
+    cards._events_storage.drop_photo_size.assert_not_awaited()
+    assert cards._bot.send_photo.await_count == 1
+
+
+def sent_cards(*chat_ids: int):
+    return [
+        EventMessage(7, chat_id, 100 + index, EventMessage.FEED, datetime.now())
+        for index, chat_id in enumerate(chat_ids)
+    ]
+
+
+async def propagate(cards: FakeCards):
+    cards._propagate_event_update(make_event())
+    await asyncio.gather(*cards._event_fanouts.values(), return_exceptions=True)
+
+
+def test_fanout_keeps_going_after_a_failed_card(monkeypatch):
+    monkeypatch.setattr(handlers.cards, "EVENT_MESSAGE_EDIT_INTERVAL", 0)
+    cards = FakeCards()
+    cards._events_storage.messages.get_sent_since.return_value = sent_cards(1, 2, 3)
+    cards._bot.edit_message_caption = mock.AsyncMock(
+        side_effect=[
+            TelegramNetworkError(method=mock.Mock(), message="timeout"),
+            bad_request("Bad Request: message to edit not found"),
+            None,
+        ]
+    )
+    cards._events_storage.messages.forget = mock.AsyncMock(
+        side_effect=DatabaseUnavailable("Database circuit is open")
+    )
+    asyncio.run(propagate(cards))
+    assert [
+        call.kwargs["chat_id"]
+        for call in cards._bot.edit_message_caption.await_args_list
+    ] == [1, 2, 3]
+
+
+def test_failed_fanout_is_logged(caplog):
+    cards = FakeCards()
+    cards._events_storage.messages.get_sent_since.side_effect = DatabaseUnavailable(
+        "Database is unavailable"
+    )
+    asyncio.run(propagate(cards))
+    assert "Failed to update sent event cards" in caplog.messages
+    assert cards._event_fanouts == {}
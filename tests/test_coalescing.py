@@ -0,0 +1,60 @@
+import asyncio
+
+from coalescing import Coalescer
+
+
+def test_burst_of_touches_collapses_into_few_calls():
+    calls = []
+
+    async def record(key):
+        calls.append(key)
+
+    async def scenario():
+        coalescer = Coalescer(0.1, record)
+        for _ in range(50):
+            coalescer.touch(1)
+            coalescer.touch(2)
+            await asyncio.sleep(0.005)
+        await asyncio.wait(coalescer.tasks)
+
+    asyncio.run(scenario())
+    assert 2 <= calls.count(1) <= 4
+    assert 2 <= calls.count(2) <= 4
+
+
+def test_forget_drops_pending_work():
+    calls = []
+
+    async def record(key):
+        calls.append(key)
+
+    async def scenario():
+        coalescer = Coalescer(0.1, record)
+        coalescer.touch(1)
+        await asyncio.sleep(0.01)
+        coalescer.touch(1)
+        coalescer.forget(1)
+        await asyncio.wait(coalescer.tasks)
+        assert not coalescer.tasks
+
+    asyncio.run(scenario())
+    assert calls == [1]
+
+
+def test_failing_callback_does_not_stop_later_runs():
+    calls = []
+
+    async def flaky(key):
+        calls.append(key)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    async def scenario():
+        coalescer = Coalescer(0.01, flaky)
+        coalescer.touch("event")
+        await asyncio.sleep(0)
+        coalescer.touch("event")
+        await asyncio.wait(coalescer.tasks)
+
+    asyncio.run(scenario())
+    assert calls == ["event", "event"]
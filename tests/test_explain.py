@@ -0,0 +1,510 @@
+import asyncio
+import contextlib
+import inspect
+import json
+import typing
+from datetime import datetime
+
+import pytest
+
+import db.storage
+from db.db import DB
+from db.migrations import migrate
+from db.storage import Event, EventsStorage, User, UsersStorage
+from kv import MemoryKV
+
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+ARCHIVE_YEAR = 2024
+USER_ID = 900000002
+EVENT_ID = 900000002
+EVENT = Event("1", "Забег", datetime(2030, 6, 1, 8), "Парк", "6:00", "photo")
+USER = User(id=USER_ID, name="Бегун")
+NEW_USER = User(id=USER_ID + 1, name="Новичок")
+THRESHOLD = datetime(ARCHIVE_YEAR, 6, 1)
+NO_QUERIES = {
+    "EventsStorage.init",
+    "EventsStorage.subscribe",
+    "RegistrationsStorage.subscribe",
+    "UsersStorage.init",
+    "UsersStorage.listen_roles",
+}
+
+
+async def explain(
+    conn, settings: typing.Sequence[str], query: str, *params
+) -> typing.Optional[typing.Any]:
+    if not query.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    for setting in settings:
+        await conn.execute(f"SET LOCAL {setting}")
+    return json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *params))
+
+
+class ExplainingConnection:
+    def __init__(self, conn, explaining_db: "ExplainingDB"):
+        self._conn = conn
+        self._db = explaining_db
+
+    def __getattr__(self, name: str):
+        return getattr(self._conn, name)
+
+    async def _explain(self, query: str, *params):
+        self._db.record(await explain(self._conn, self._db.settings, query, *params))
+
+    async def execute(self, query: str, *params, **kwargs):
+        await self._explain(query, *params)
+        return await self._conn.execute(query, *params, **kwargs)
+
+    async def executemany(self, query: str, args, **kwargs):
+        args = list(args)
+        if args:
+            await self._explain(query, *args[0])
+        return await self._conn.executemany(query, args, **kwargs)
+
+    async def fetch(self, query: str, *params, **kwargs):
+        await self._explain(query, *params)
+        return await self._conn.fetch(query, *params, **kwargs)
+
+    async def fetchrow(self, query: str, *params, **kwargs):
+        await self._explain(query, *params)
+        return await self._conn.fetchrow(query, *params, **kwargs)
+
+    async def fetchval(self, query: str, *params, **kwargs):
+        await self._explain(query, *params)
+        return await self._conn.fetchval(query, *params, **kwargs)
+
+    async def cursor(self, query: str, *params, **kwargs):
+        await self._explain(query, *params)
+        async for row in self._conn.cursor(query, *params, **kwargs):
+            yield row
+
+
+class ExplainingDB(DB):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.settings: typing.List[str] = []
+        self.plans: typing.List[typing.Any] = []
+
+    def record(self, plan: typing.Optional[typing.Any]):
+        if plan is not None:
+            self.plans.append(plan)
+
+    async def _run(self, method: str, query: str, *params):
+        async with super().transaction() as conn:
+            self.record(await explain(conn, self.settings, query, *params))
+        return await super()._run(method, query, *params)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        async with super().transaction() as conn:
+            yield ExplainingConnection(conn, self)
+
+
+def index_names(plan: typing.Any) -> typing.Set[str]:
+    names = set()
+    if isinstance(plan, list):
+        for item in plan:
+            names |= index_names(item)
+    elif isinstance(plan, dict):
+        if "Index Name" in plan:
+            names.add(plan["Index Name"])
+        names.update(plan.get("Conflict Arbiter Indexes", ()))
+        for value in plan.values():
+            names |= index_names(value)
+    return names
+
+
+def storage_methods() -> typing.Set[str]:
+    methods = set()
+    for name, cls in vars(db.storage).items():
+        if not name.endswith("Storage"):
+            continue
+        for method, value in vars(cls).items():
+            if method.startswith("_"):
+                continue
+            if inspect.iscoroutinefunction(value) or inspect.isasyncgenfunction(value):
+                methods.add(f"{name}.{method}")
+    return methods
+
+
+async def drain(rows: typing.AsyncIterator):
+    return [row async for row in rows]
+
+
+async def recreate(users: UsersStorage, user: User):
+    await users.delete(user.id)
+    await users.create(user)
+
+
+async def in_transaction(events: EventsStorage, call: typing.Callable):
+    async with events._db.transaction() as conn:
+        await call(conn)
+
+
+async def seed(conn):
+    await conn.execute(
+        "INSERT INTO users (id, name) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+        USER_ID,
+        USER.name,
+    )
+    await conn.execute(
+        """
+        INSERT INTO events (id, city, description, date, location, tempo, photo_id)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        ON CONFLICT DO NOTHING
+        """,
+        EVENT_ID,
+        EVENT.city,
+        EVENT.description,
+        EVENT.date,
+        EVENT.location,
+        EVENT.tempo,
+        EVENT.photo_id,
+    )
+
+
+async def used_indexes(
+    postgres: dict, call: typing.Callable, settings: typing.Sequence[str]
+) -> typing.Set[str]:
+    explaining_db = ExplainingDB(**postgres)
+    await explaining_db.init()
+    try:
+        await migrate(explaining_db)
+        kv = MemoryKV()
+        users = UsersStorage(explaining_db, kv)
+        events = EventsStorage(explaining_db, kv)
+        async with explaining_db.transaction() as conn:
+            await events._create_archive_partitions(conn, ARCHIVE_YEAR)
+            await seed(conn)
+        explaining_db.settings = ["enable_seqscan = off", *settings]
+        explaining_db.plans.clear()
+        await call(users, events)
+        assert explaining_db.plans, "storage call issued no queries"
+        return index_names(explaining_db.plans)
+    finally:
+        await explaining_db.close()
+
+
+def case(
+    method: str,
+    call: typing.Callable,
+    *indexes: str,
+    variant: str = "",
+    bitmap: bool = False,
+):
+    return pytest.param(
+        call,
+        set(indexes),
+        ("enable_indexscan = off",) if bitmap else (),
+        id=f"{method}-{variant}" if variant else method,
+    )
+
+
+CASES = [
+    case(
+        "DashboardStorage.get",
+        lambda users, events: events.dashboard.get(),
+        "events_date_idx",
+        "users_created_at_idx",
+    ),
+    case(
+        "EventMessagesStorage.record",
+        lambda users, events: events.messages.record([(EVENT_ID, 1, 1, "card")]),
+    ),
+    case(
+        "EventMessagesStorage.get_sent_since",
+        lambda users, events: events.messages.get_sent_since(EVENT_ID, THRESHOLD),
+        "event_messages_event_id_sent_at_idx",
+    ),
+    case(
+        "EventMessagesStorage.forget",
+        lambda users, events: events.messages.forget(1, 1),
+        "event_messages_pkey",
+    ),
+    case(
+        "EventTemplatesStorage.create_from_event",
+        lambda users, events: events.templates.create_from_event(EVENT_ID),
+        "events_pkey",
+    ),
+    case(
+        "EventTemplatesStorage.get_active",
+        lambda users, events: events.templates.get_active(),
+    ),
+    case(
+        "EventTemplatesStorage.deactivate",
+        lambda users, events: events.templates.deactivate(1),
+        "event_templates_pkey",
+    ),
+    case(
+        "EventTemplatesStorage.materialize",
+        lambda users, events: events.templates.materialize(weeks=2),
+        "events_template_id_date_idx",
+    ),
+    case(
+        "EventsStorage.get_by_id",
+        lambda users, events: events.get_by_id(EVENT_ID),
+        "events_pkey",
+    ),
+    case(
+        "EventsStorage.get_by_id",
+        lambda users, events: events.get_by_id(EVENT_ID, include_history=True),
+        "events_pkey",
+        f"events_archive_{ARCHIVE_YEAR}_id_idx",
+        variant="history",
+    ),
+    case(
+        "EventsStorage.get_many",
+        lambda users, events: events.get_many([EVENT_ID]),
+        "events_pkey",
+    ),
+    case("EventsStorage.create", lambda users, events: events.create(EVENT)),
+    case(
+        "EventsStorage.update_fields",
+        lambda users, events: events.update_fields(EVENT_ID, 1, tempo="5:30"),
+        "events_pkey",
+    ),
+    case(
+        "EventsStorage.drop_photo_size",
+        lambda users, events: events.drop_photo_size(EVENT_ID, "photo"),
+        "events_pkey",
+    ),
+    case(
+        "EventsStorage.get_all_events",
+        lambda users, events: events.get_all_events(actual_only=True),
+        "events_date_idx",
+    ),
+    case(
+        "EventsStorage.search_events",
+        lambda users, events: events.search_events(text="стадион"),
+        "events_description_trgm_idx",
+        "events_location_trgm_idx",
+        f"events_archive_{ARCHIVE_YEAR}_description_idx",
+        f"events_archive_{ARCHIVE_YEAR}_location_idx",
+        variant="text",
+        bitmap=True,
+    ),
+    case(
+        "EventsStorage.search_events",
+        lambda users, events: events.search_events(
+            city="1", date_from=THRESHOLD, include_history=False
+        ),
+        "events_city_date_idx",
+        variant="city",
+        bitmap=True,
+    ),
+    case(
+        "EventsStorage.get_event_amount",
+        lambda users, events: events.get_event_amount(),
+    ),
+    case(
+        "EventsStorage.delete",
+        lambda users, events: events.delete(EVENT_ID),
+        "events_pkey",
+        "event_stats_pkey",
+    ),
+    case(
+        "EventsStorage.archive_finished",
+        lambda users, events: events.archive_finished(),
+        "events_date_idx",
+    ),
+    case(
+        "EventsStorage.register_user",
+        lambda users, events: events.register_user(USER_ID, EVENT_ID),
+    ),
+    case(
+        "EventsStorage.unregister_user",
+        lambda users, events: events.unregister_user(USER_ID, EVENT_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "EventsStorage.is_user_registered",
+        lambda users, events: events.is_user_registered(USER_ID, EVENT_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "EventsStorage.get_event_participants",
+        lambda users, events: events.get_event_participants(
+            EVENT_ID, include_history=True
+        ),
+        "registrations_event_id_late_idx",
+        f"registrations_archive_{ARCHIVE_YEAR}_event_id_idx",
+    ),
+    case(
+        "EventsStorage.get_user_events",
+        lambda users, events: events.get_user_events(USER_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "RegistrationsStorage.register",
+        lambda users, events: events.registrations.register(USER_ID, EVENT_ID),
+    ),
+    case(
+        "RegistrationsStorage.unregister",
+        lambda users, events: events.registrations.unregister(USER_ID, EVENT_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "RegistrationsStorage.is_registered",
+        lambda users, events: events.registrations.is_registered(USER_ID, EVENT_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "RegistrationsStorage.get_event_registrations",
+        lambda users, events: events.registrations.get_event_registrations(EVENT_ID),
+        "registrations_event_id_late_idx",
+    ),
+    case(
+        "RegistrationsStorage.get_event_lates",
+        lambda users, events: events.registrations.get_event_lates(EVENT_ID),
+        "registrations_event_id_late_idx",
+    ),
+    case(
+        "RegistrationsStorage.get_user_registrations",
+        lambda users, events: events.registrations.get_user_registrations(
+            1, include_history=True
+        ),
+        "registrations_pkey",
+        f"registrations_archive_{ARCHIVE_YEAR}_pkey",
+    ),
+    case(
+        "RegistrationsStorage.archive",
+        lambda users, events: in_transaction(
+            events, lambda conn: events.registrations.archive(conn, THRESHOLD)
+        ),
+        "events_date_idx",
+    ),
+    case(
+        "RegistrationsStorage.set_late",
+        lambda users, events: events.registrations.set_late(USER_ID, EVENT_ID, 0),
+        "registrations_pkey",
+    ),
+    case(
+        "RegistrationsStorage.toggle_attended",
+        lambda users, events: events.registrations.toggle_attended(USER_ID, EVENT_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "RegistrationsStorage.get_event_roster",
+        lambda users, events: events.registrations.get_event_roster(EVENT_ID),
+        "registrations_event_id_late_idx",
+        "users_pkey",
+    ),
+    case(
+        "RegistrationsStorage.get_registration",
+        lambda users, events: events.registrations.get_registration(USER_ID, EVENT_ID),
+        "registrations_pkey",
+    ),
+    case(
+        "RegistrationsStorage.iter_event_roster",
+        lambda users, events: drain(events.registrations.iter_event_roster(EVENT_ID)),
+        "registrations_event_id_late_idx",
+        "users_pkey",
+    ),
+    case(
+        "RegistrationsStorage.import_registrations",
+        lambda users, events: events.registrations.import_registrations(
+            [(USER_ID, EVENT_ID, 0)]
+        ),
+        "events_pkey",
+    ),
+    case(
+        "StatsStorage.get_user_stats",
+        lambda users, events: events.stats.get_user_stats(USER_ID),
+        "user_stats_pkey",
+    ),
+    case(
+        "StatsStorage.get_events_stats",
+        lambda users, events: events.stats.get_events_stats([EVENT_ID]),
+        "event_stats_pkey",
+    ),
+    case(
+        "StatsStorage.forget_event",
+        lambda users, events: in_transaction(
+            events, lambda conn: events.stats.forget_event(conn, EVENT_ID)
+        ),
+        "event_stats_pkey",
+    ),
+    case(
+        "UsersStorage.get_by_id",
+        lambda users, events: users.get_by_id(USER_ID),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.get_many",
+        lambda users, events: users.get_many([USER_ID]),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.promote_to_admin",
+        lambda users, events: users.promote_to_admin(USER_ID),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.demote_from_admin",
+        lambda users, events: users.demote_from_admin(USER_ID),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.get_role_list",
+        lambda users, events: users.get_role_list(User.ADMIN),
+    ),
+    case("UsersStorage.create", lambda users, events: recreate(users, NEW_USER)),
+    case("UsersStorage.update", lambda users, events: users.update(USER), "users_pkey"),
+    case("UsersStorage.get_all_members", lambda users, events: users.get_all_members()),
+    case(
+        "UsersStorage.get_members_page",
+        lambda users, events: users.get_members_page(),
+        "users_name_id_idx",
+    ),
+    case(
+        "UsersStorage.get_members_page",
+        lambda users, events: users.get_members_page(after=("Бегун", USER_ID)),
+        "users_name_id_idx",
+        variant="after",
+    ),
+    case(
+        "UsersStorage.get_members_page",
+        lambda users, events: users.get_members_page(query="бег"),
+        "users_name_trgm_idx",
+        "users_phone_trgm_idx",
+        variant="search",
+        bitmap=True,
+    ),
+    case(
+        "UsersStorage.iter_members",
+        lambda users, events: drain(users.iter_members()),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.import_members",
+        lambda users, events: users.import_members(
+            [(USER_ID, "Бегун", "+79990000000", None, "1", User.USER)]
+        ),
+        "users_pkey",
+    ),
+    case("UsersStorage.get_user_amount", lambda users, events: users.get_user_amount()),
+    case(
+        "UsersStorage.ban_user",
+        lambda users, events: users.ban_user(USER_ID),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.unban_user",
+        lambda users, events: users.unban_user(USER_ID),
+        "users_pkey",
+    ),
+    case(
+        "UsersStorage.delete", lambda users, events: users.delete(USER_ID), "users_pkey"
+    ),
+]
+
+
+def test_every_storage_query_is_explained():
+    explained = {param.id.split("-")[0] for param in CASES}
+    assert storage_methods() - NO_QUERIES == explained
+
+
+@pytest.mark.parametrize("call, indexes, settings", CASES)
+def test_storage_query_uses_index(postgres, call, indexes, settings):
+    assert indexes <= asyncio.run(used_indexes(postgres, call, settings))
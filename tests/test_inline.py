@@ -0,0 +1,32 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest import mock
+
+import inline
+from db.resilience import DatabaseUnavailable
+from db.storage import Event
+from inline import UpcomingEvents
+
+
+def test_failed_reload_is_retried(monkeypatch):
+    monkeypatch.setattr(inline, "REFRESH_RETRY_DELAY", 0.01)
+    event = Event(
+        "1", "Интервалы", datetime.now() + timedelta(days=1), "Стадион", "5:00", "photo"
+    )
+    storage = mock.Mock()
+    storage.get_all_events = mock.AsyncMock(
+        side_effect=[
+            DatabaseUnavailable("Database is unavailable"),
+            DatabaseUnavailable("Database circuit is open"),
+            [event],
+        ]
+    )
+    upcoming = UpcomingEvents(storage)
+
+    async def scenario():
+        upcoming._on_change("update", "1")
+        await asyncio.wait_for(upcoming._reload_task, 5)
+
+    asyncio.run(scenario())
+    assert storage.get_all_events.await_count == 3
+    assert upcoming.search("стадион") == [event]
@@ -0,0 +1,85 @@
+import asyncio
+import typing
+
+from db.db import DB
+from db.migrations import migrate
+from db.storage import User, UsersStorage
+from kv import MemoryKV
+
+
+USER_ID = 900000001
+
+
+async def wait_for(condition: typing.Callable[[], bool], timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting"
+        await asyncio.sleep(0.05)
+
+
+async def replicas(
+    postgres: dict,
+) -> typing.List[typing.Tuple[DB, MemoryKV, UsersStorage]]:
+    result = []
+    for _ in range(2):
+        db = DB(**postgres)
+        kv = MemoryKV()
+        users_storage = UsersStorage(db, kv)
+        await db.init()
+        await users_storage.init()
+        result.append((db, kv, users_storage))
+    await migrate(result[0][0])
+    return result
+
+
+async def check_invalidation(postgres: dict):
+    (db_a, kv_a, users_a), (db_b, kv_b, users_b) = await replicas(postgres)
+    cache_key = f"user:{USER_ID}"
+    try:
+        await users_a.delete(USER_ID)
+        await users_a.create(User(id=USER_ID, name="Старое имя"))
+        assert (await users_b.get_by_id(USER_ID)).name == "Старое имя"
+        assert await kv_b.get(cache_key) is not None
+        assert (await users_a.get_by_id(USER_ID)).name == "Старое имя"
+
+        await users_a.update(User(id=USER_ID, name="Новое имя"))
+        await wait_for(lambda: cache_key not in kv_b._data)
+        assert (await users_b.get_by_id(USER_ID)).name == "Новое имя"
+
+        await users_b.update(User(id=USER_ID, name="Имя с другой реплики"))
+        await wait_for(lambda: cache_key not in kv_a._data)
+        assert (await users_a.get_by_id(USER_ID)).name == "Имя с другой реплики"
+    finally:
+        await users_a.delete(USER_ID)
+        await db_a.close()
+        await db_b.close()
+
+
+async def check_reload_after_reconnect(postgres: dict):
+    (db_a, kv_a, users_a), (db_b, kv_b, users_b) = await replicas(postgres)
+    try:
+        await users_a.delete(USER_ID)
+        await users_a.create(User(id=USER_ID, name="Бегун"))
+        await users_b.get_by_id(USER_ID)
+        assert f"user:{USER_ID}" in kv_b._data
+
+        listener = db_b._listener
+        await db_a.execute("SELECT pg_terminate_backend($1)", listener.get_server_pid())
+        await wait_for(lambda: f"user:{USER_ID}" not in kv_b._data)
+        assert db_b._listener is not listener
+
+        await users_b.get_by_id(USER_ID)
+        await users_a.update(User(id=USER_ID, name="После переподключения"))
+        await wait_for(lambda: f"user:{USER_ID}" not in kv_b._data)
+    finally:
+        await users_a.delete(USER_ID)
+        await db_a.close()
+        await db_b.close()
+
+
+def test_replicas_see_each_others_invalidations(postgres):
+    asyncio.run(check_invalidation(postgres))
+
+
+def test_listener_reconnect_reloads_caches(postgres):
+    asyncio.run(check_reload_after_reconnect(postgres))
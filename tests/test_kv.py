@@ -0,0 +1,166 @@
+import asyncio
+import uuid
+from datetime import datetime
+from unittest import mock
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from db.storage import Event, User
+from handlers.states import GetUserData
+from kv import KVStorage, MemoryKV, RedisKV, dump_record, load_record
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_kv(request):
+    if request.param == "memory":
+        return lambda: MemoryKV(max_size=None)
+    url = request.getfixturevalue("redis_url")
+    namespace = f"physhka-test:{uuid.uuid4().hex}:"
+    return lambda: RedisKV(url, namespace)
+
+
+def run_with(make_kv, scenario):
+    async def run():
+        kv = make_kv()
+        try:
+            await scenario(kv)
+        finally:
+            await kv.delete_prefix("")
+            await kv.close()
+
+    asyncio.run(run())
+
+
+def test_user_round_trips_through_json():
+    user = User(id=42, name="Бегун", phone="+79990000000", role=User.ADMIN)
+    assert load_record(User, dump_record(user)) == user
+
+
+def test_event_round_trip_restores_datetimes_and_lists():
+    event = Event(
+        city="1",
+        description="Интервалы",
+        date=datetime(2024, 6, 1, 8, 30),
+        location="Стадион",
+        tempo="5:00",
+        photo_id="large",
+        id=7,
+        updated_at=datetime(2024, 5, 31, 12, 0, 1, 250),
+        version=3,
+        photo_ids=["small", "medium", "large"],
+    )
+    restored = load_record(Event, dump_record(event))
+    assert restored == event
+    assert isinstance(restored.date, datetime)
+
+
+def test_missing_datetime_stays_none():
+    event = Event("1", "Забег", datetime(2024, 6, 1), "Парк", "6:00", "photo")
+    assert load_record(Event, dump_record(event)).updated_at is None
+
+
+def test_memory_kv_expires_and_evicts_least_recently_used():
+    async def scenario():
+        kv = MemoryKV(max_size=2)
+        with mock.patch("kv.time.monotonic", return_value=0):
+            await kv.set("a", "1", ttl=10)
+            await kv.set("b", "2")
+            assert await kv.get("a") == "1"
+            await kv.set("c", "3")
+            assert await kv.mget(["a", "b", "c"]) == ["1", None, "3"]
+        with mock.patch("kv.time.monotonic", return_value=11):
+            assert await kv.get("a") is None
+            assert await kv.get("c") == "3"
+
+    asyncio.run(scenario())
+
+
+def test_unbounded_memory_kv_never_evicts():
+    async def scenario():
+        kv = MemoryKV(max_size=None)
+        await kv.mset({f"fsm:{index}": "state" for index in range(20000)})
+        assert await kv.get("fsm:0") == "state"
+        await kv.delete_prefix("fsm:1")
+        assert await kv.get("fsm:1") is None
+        assert await kv.get("fsm:2") == "state"
+
+    asyncio.run(scenario())
+
+
+def test_kv_sets_and_reads_many_keys(make_kv):
+    async def scenario(kv):
+        assert await kv.get("missing") is None
+        assert await kv.mget([]) == []
+        await kv.mset({})
+        await kv.set("a", "1")
+        await kv.mset({"b": "2", "c": "3"})
+        assert await kv.mget(["c", "missing", "a", "b"]) == ["3", None, "1", "2"]
+        await kv.delete("a", "b")
+        await kv.delete()
+        assert await kv.mget(["a", "b", "c"]) == [None, None, "3"]
+
+    run_with(make_kv, scenario)
+
+
+def test_kv_expires_keys_after_their_ttl(make_kv):
+    async def scenario(kv):
+        await kv.set("short", "1", ttl=0.05)
+        await kv.mset({"batch": "2"}, ttl=0.05)
+        await kv.set("forever", "3")
+        assert await kv.mget(["short", "batch"]) == ["1", "2"]
+        await asyncio.sleep(0.15)
+        assert await kv.mget(["short", "batch", "forever"]) == [None, None, "3"]
+
+    run_with(make_kv, scenario)
+
+
+def test_kv_deletes_by_prefix_in_batches(make_kv):
+    async def scenario(kv):
+        await kv.mset({f"event:{index}": "cached" for index in range(1200)})
+        await kv.set("user:1", "cached")
+        await kv.delete_prefix("event:")
+        assert await kv.mget(["event:0", "event:1199", "user:1"]) == [
+            None,
+            None,
+            "cached",
+        ]
+
+    run_with(make_kv, scenario)
+
+
+def test_kv_round_trips_records(make_kv):
+    event = Event(
+        "1",
+        "Длинная",
+        datetime(2024, 6, 1, 7),
+        "Парк",
+        "5:30",
+        "photo",
+        id=3,
+        updated_at=datetime(2024, 5, 1),
+        photo_ids=["small", "photo"],
+    )
+
+    async def scenario(kv):
+        await kv.set("event:3", dump_record(event))
+        assert load_record(Event, await kv.get("event:3")) == event
+
+    run_with(make_kv, scenario)
+
+
+def test_fsm_storage_keeps_state_and_data(make_kv):
+    key = StorageKey(bot_id=1, chat_id=-100, user_id=7)
+
+    async def scenario(kv):
+        storage = KVStorage(kv)
+        await storage.set_state(key, GetUserData.name)
+        await storage.set_data(key, {"name": "Бегун", "step": 2})
+        assert await storage.get_state(key) == GetUserData.name.state
+        assert await storage.get_data(key) == {"name": "Бегун", "step": 2}
+        await storage.set_state(key, None)
+        await storage.set_data(key, {})
+        assert await storage.get_state(key) is None
+        assert await storage.get_data(key) == {}
+
+    run_with(make_kv, scenario)
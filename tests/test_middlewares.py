@@ -0,0 +1,86 @@
+import asyncio
+from unittest import mock
+
+import aiogram
+
+from middlewares import RepeatedTapMiddleware
+
+
+def make_callback(
+    update_id: int, data: str = "register_1"
+) -> aiogram.types.CallbackQuery:
+    return aiogram.types.CallbackQuery.model_validate(
+        {
+            "id": str(update_id),
+            "chat_instance": "chat",
+            "data": data,
+            "from": {"id": 1, "is_bot": False, "first_name": "Бегун"},
+            "message": {
+                "message_id": 10,
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+            },
+        }
+    )
+
+
+async def tap(middleware, handler, update_id: int, data: str = "register_1"):
+    callback = make_callback(update_id, data)
+    return await middleware(
+        handler,
+        callback,
+        {"event_chat": callback.message.chat, "event_from_user": callback.from_user},
+    )
+
+
+def run_taps(middleware, scenario):
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.id)
+        await asyncio.sleep(0.05)
+
+    with mock.patch.object(
+        aiogram.types.CallbackQuery, "answer", new=mock.AsyncMock()
+    ) as answer:
+        asyncio.run(scenario(middleware, handler))
+    return handled, answer
+
+
+def test_repeated_tap_is_answered_without_running_the_handler():
+    async def scenario(middleware, handler):
+        await tap(middleware, handler, 1)
+        await tap(middleware, handler, 2)
+        await tap(middleware, handler, 3, data="late_1_5")
+
+    handled, answer = run_taps(RepeatedTapMiddleware(), scenario)
+    assert handled == ["1", "3"]
+    assert answer.await_count == 1
+
+
+def test_tap_after_the_debounce_window_is_handled():
+    async def scenario(middleware, handler):
+        await tap(middleware, handler, 1)
+        await asyncio.sleep(0.15)
+        await tap(middleware, handler, 2)
+
+    handled, _ = run_taps(RepeatedTapMiddleware(debounce=0.1), scenario)
+    assert handled == ["1", "2"]
+
+
+def test_window_restarts_when_a_slow_handler_finishes():
+    async def scenario(middleware, handler):
+        lock = asyncio.Lock()
+
+        async def isolated(update_id):
+            async with lock:
+                await tap(middleware, slow_handler, update_id)
+
+        async def slow_handler(event, data):
+            await asyncio.sleep(0.15)
+            await handler(event, data)
+
+        await asyncio.gather(isolated(1), isolated(2))
+
+    handled, _ = run_taps(RepeatedTapMiddleware(debounce=0.1), scenario)
+    assert handled == ["1"]
@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+from unittest import mock
+
+import asyncpg
+import pytest
+
+from db.db import DB
+from db.resilience import CircuitBreaker, DatabaseUnavailable, is_idempotent
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.open
+    with pytest.raises(DatabaseUnavailable):
+        breaker.before_call()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.open
+
+
+def test_half_open_allows_one_probe_per_window():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    with mock.patch("db.resilience.time.monotonic", return_value=100):
+        breaker.record_failure()
+    with mock.patch("db.resilience.time.monotonic", return_value=111):
+        breaker.before_call()
+        with pytest.raises(DatabaseUnavailable):
+            breaker.before_call()
+        breaker.record_failure()
+    with mock.patch("db.resilience.time.monotonic", return_value=122):
+        breaker.before_call()
+        breaker.record_success()
+        assert not breaker.open
+        breaker.before_call()
+
+
+def test_only_selects_are_retried():
+    assert is_idempotent("\n  select id FROM users")
+    assert not is_idempotent("WITH created AS (INSERT INTO users ...) SELECT 1")
+    assert not is_idempotent("UPDATE users SET name = $1")
+
+
+class FakeConnection:
+    def __init__(self, error: Exception):
+        self.error = error
+        self.calls = 0
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetch(self, query, *params, timeout=None):
+        self.calls += 1
+        raise self.error
+
+
+class FakePool:
+    def __init__(self, error: Exception, acquire_error: Exception = None):
+        self.connection = FakeConnection(error)
+        self.acquire_error = acquire_error
+        self.expired = 0
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, timeout=None):
+        if self.acquire_error is not None:
+            raise self.acquire_error
+        yield self.connection
+
+    def expire_connections(self):
+        self.expired += 1
+
+
+def make_db(error: Exception, acquire_error: Exception = None) -> DB:
+    db = DB("localhost", "5432", "postgres", "postgres", "postgres")
+    db._pool = FakePool(error, acquire_error)
+    return db
+
+
+async def run_in_transaction(db: DB, error: Exception):
+    async with db.transaction():
+        raise error
+
+
+def test_statement_timeout_is_not_retried_or_counted():
+    db = make_db(asyncio.TimeoutError())
+    with pytest.raises(DatabaseUnavailable):
+        asyncio.run(db.fetch("SELECT 1"))
+    assert db._pool.connection.calls == 1
+    assert not db._breaker.open
+    assert db._breaker._failures == 0
+
+
+def test_connection_errors_are_retried_and_counted():
+    db = make_db(ConnectionResetError())
+    with mock.patch("db.db.backoff_delay", return_value=0):
+        with pytest.raises(DatabaseUnavailable):
+            asyncio.run(db.fetch("SELECT 1"))
+    assert db._pool.connection.calls == 3
+    assert db._breaker._failures == 1
+
+
+def test_server_error_closes_a_half_open_circuit():
+    db = make_db(asyncpg.UniqueViolationError("duplicate key"))
+    db._breaker._opened_at = -1e9
+    with pytest.raises(asyncpg.UniqueViolationError):
+        asyncio.run(db.fetch("SELECT 1"))
+    assert not db._breaker.open
+
+
+def test_client_side_data_error_is_not_retried_or_counted():
+    db = make_db(asyncpg.exceptions._base.DataError("invalid input for query"))
+    with pytest.raises(asyncpg.exceptions._base.DataError):
+        asyncio.run(db.fetch("SELECT 1"))
+    assert db._pool.connection.calls == 1
+    assert db._pool.expired == 0
+    assert db._breaker._failures == 0
+
+
+def test_errors_from_the_transaction_body_are_not_classified():
+    db = make_db(None)
+    with pytest.raises(TimeoutError):
+        asyncio.run(run_in_transaction(db, TimeoutError()))
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(run_in_transaction(db, ConnectionResetError()))
+    assert db._pool.expired == 0
+    assert db._breaker._failures == 0
+
+
+def test_failed_acquire_for_a_transaction_is_counted():
+    db = make_db(None, acquire_error=ConnectionRefusedError())
+    with pytest.raises(DatabaseUnavailable):
+        asyncio.run(run_in_transaction(db, AssertionError()))
+    assert db._pool.expired == 1
+    assert db._breaker._failures == 1
+
+
+def test_statements_in_a_transaction_time_out(postgres):
+    async def scenario():
+        db = DB(**postgres, query_timeout=0.2)
+        await db.init()
+        try:
+            async with db.transaction() as conn:
+                await conn.execute("SELECT pg_sleep(2)")
+        finally:
+            await db.close()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
@@ -0,0 +1,160 @@
+import asyncio
+from unittest import mock
+
+import aiogram
+from aiogram.exceptions import TelegramServerError
+from aiogram.types import Update
+from aiogram.utils.backoff import BackoffConfig
+
+import sharding
+from sharding import ShardIngress, update_chat_id
+
+
+GROUP = {"id": -100, "type": "supergroup", "title": "Бег"}
+RUNNER = {"id": 7, "is_bot": False, "first_name": "Бегун"}
+FAST_BACKOFF = BackoffConfig(min_delay=0.01, max_delay=0.05, factor=2, jitter=0)
+
+
+def make_message_update(update_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": GROUP,
+                "from": RUNNER,
+                "text": "привет",
+            },
+        }
+    )
+
+
+def make_callback_update(update_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": "1",
+                "chat_instance": "chat",
+                "data": "register_1",
+                "from": RUNNER,
+                "message": {"message_id": 2, "date": 0, "chat": GROUP},
+            },
+        }
+    )
+
+
+class FakeProcess:
+    def __init__(self):
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+class FakeWorker:
+    def __init__(self, path: str):
+        self.path = path
+        self.lines = []
+        self.server = None
+        self.received = asyncio.Event()
+
+    async def start(self):
+        self.server = await asyncio.start_unix_server(self._read, path=self.path)
+
+    async def _read(self, reader, writer):
+        async for line in reader:
+            self.lines.append(line)
+            self.received.set()
+        writer.close()
+
+    def kill(self, process: FakeProcess):
+        process.alive = False
+        process.exitcode = 1
+        self.server.close()
+
+
+def test_callback_is_routed_with_the_messages_of_its_chat():
+    assert update_chat_id(make_callback_update(1)) == GROUP["id"]
+    assert update_chat_id(make_message_update(2)) == GROUP["id"]
+
+
+def test_inline_query_is_routed_by_user():
+    update = Update.model_validate(
+        {
+            "update_id": 1,
+            "inline_query": {"id": "1", "from": RUNNER, "query": "", "offset": ""},
+        }
+    )
+    assert update_chat_id(update) == RUNNER["id"]
+
+
+def test_dead_worker_is_restarted_and_gets_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "RESTART_BACKOFF", FAST_BACKOFF)
+
+    async def scenario():
+        worker = FakeWorker(str(tmp_path / "worker_0.sock"))
+        await worker.start()
+        process = FakeProcess()
+        restarted = []
+
+        def restart(index: int) -> FakeProcess:
+            restarted.append(index)
+            asyncio.get_running_loop().create_task(worker.start())
+            return FakeProcess()
+
+        ingress = ShardIngress(mock.Mock(), [worker.path], [process], restart)
+        ingress._writers[0] = await ingress._connect(0)
+        worker.kill(process)
+
+        await ingress._deliver(0, [b"update\n"])
+        await asyncio.wait_for(worker.received.wait(), 5)
+        ingress._writers[0].close()
+        worker.server.close()
+        return restarted, worker.lines
+
+    restarted, lines = asyncio.run(scenario())
+    assert restarted == [0]
+    assert lines == [b"update\n"]
+
+
+def test_polling_survives_server_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "POLLING_BACKOFF", FAST_BACKOFF)
+
+    async def scenario():
+        worker = FakeWorker(str(tmp_path / "worker_0.sock"))
+        await worker.start()
+        bot = mock.Mock(spec=aiogram.Bot)
+        bot.delete_webhook = mock.AsyncMock()
+        stopped = asyncio.Event()
+
+        async def get_updates(offset, timeout):
+            if get_updates.calls == 0:
+                get_updates.calls += 1
+                raise TelegramServerError(method=mock.Mock(), message="Bad Gateway")
+            if get_updates.calls == 1:
+                get_updates.calls += 1
+                return [make_message_update(5)]
+            get_updates.offsets.append(offset)
+            await stopped.wait()
+            return []
+
+        get_updates.calls = 0
+        get_updates.offsets = []
+        bot.get_updates = get_updates
+
+        ingress = ShardIngress(bot, [worker.path], [FakeProcess()], mock.Mock())
+        running = asyncio.create_task(ingress.run())
+        await asyncio.wait_for(worker.received.wait(), 5)
+        await ingress.stop()
+        stopped.set()
+        await asyncio.wait_for(running, 5)
+        worker.server.close()
+        return worker.lines, get_updates.offsets
+
+    lines, offsets = asyncio.run(scenario())
+    assert len(lines) == 1
+    assert Update.model_validate_json(lines[0]).update_id == 5
+    assert offsets == [6]
@@ -0,0 +1,8 @@
+import statistics
+
+from startup import STARTUP_BUDGET, run_once
+
+
+def test_bot_starts_within_budget():
+    timings = [run_once("main", cold=False)[0] for _ in range(3)]
+    assert statistics.median(timings) <= STARTUP_BUDGET